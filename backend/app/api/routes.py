@@ -1,47 +1,122 @@
-from fastapi import APIRouter, HTTPException
-from ..models import URLRequest, SingleReviewRequest, OpenAPIReviewRequest
-from ..services.scraper import extract_reviews
-from ..services.fake_review_classifier import detect_fake_reviews
-from ..services.open_api_controller import api_check_fake_reviews
+import asyncio
+import json
+import logging
+import secrets
+from contextlib import aclosing
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from ..models import URLRequest, SingleReviewRequest, OpenAPIReviewRequest, OpenAPIBatchReviewRequest, FeedbackRequest
+from ..services.scraper import extract_reviews, iter_review_pages, scrape_cache
+from ..services.fake_review_classifier import detect_fake_reviews_async
+from ..services.open_api_controller import api_check_fake_reviews_async, api_check_fake_reviews_batch_async, THRESHOLD_MAP
+from ..services.inference_worker import InferenceQueueFull
+from ..services.cache import prediction_cache
+from ..services.review_classifier import loaded_models, required_tiers
+from ..services.online_model import feedback_buffer
+from ..services.browser_pool import crawler_pool
+from ..config import settings
+from ..services.jobs import analysis_jobs, JobQueueFull
+from ..services.llm_client import LLMRateLimited
 # from app.services.preprocessing import text_process
 
+logger = logging.getLogger(__name__)
+
 # Add prefix to the router
 router = APIRouter(prefix="/api")
 
 @router.post("/analyze-reviews")
 # input format : { url : "http:somthing.com", threshold: 0.70}
-async def analyze_reviews(url_request: URLRequest):
+# with "job": true the response is 202 { job_id, status, attached }, poll /analyze-reviews/jobs/{job_id} for the results
+async def analyze_reviews(url_request: URLRequest, response: Response):
     try:
-        # Add logging
-        print(f"Received request to analyze URL: {url_request.url}")
-        print(f"Using threshold: {url_request.threshold}")
+        logger.debug("Received request to analyze url=%s threshold=%s", url_request.url, url_request.threshold)
+
+        if url_request.job:
+            job, attached = analysis_jobs.submit(
+                str(url_request.url),
+                page_limit=url_request.page_limit,
+                threshold=url_request.threshold,
+                model_tier=url_request.model,
+                force_refresh=url_request.force_refresh,
+            )
+            logger.debug("%s analysis job %s", "Attached to" if attached else "Queued", job.id)
+            response.status_code = 202
+            return {"job_id": job.id, "status": job.status, "attached": attached}
         
         # Extract reviews from the provided URL
-        reviews = await extract_reviews(str(url_request.url))
+        reviews = await extract_reviews(str(url_request.url), page_limit=url_request.page_limit, force_refresh=url_request.force_refresh)
         
         if not reviews:
-            print("No reviews found for the URL")
+            logger.info("No reviews found for url=%s", url_request.url)
             raise HTTPException(status_code=404, detail="No reviews found.")
 
-        print(f"Successfully extracted {len(reviews)} reviews")
+        logger.debug("Successfully extracted %d reviews", len(reviews))
         
         # Detect fake reviews
-        analyzed_reviews = detect_fake_reviews(reviews, threshold=url_request.threshold)
-        print(f"Analysis complete. Processed {len(analyzed_reviews)} reviews")
+        analyzed_reviews = await detect_fake_reviews_async(reviews, threshold=url_request.threshold, model_tier=url_request.model)
+        logger.debug("Analysis complete. Processed %d reviews", len(analyzed_reviews))
         
         return {"analyzed_reviews": analyzed_reviews}
 
+    except (InferenceQueueFull, JobQueueFull) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except LLMRateLimited as e:
+        # Retryable, unlike a page without reviews
+        headers = {"Retry-After": str(max(1, round(e.retry_after or settings.llm_backoff_max)))}
+        raise HTTPException(status_code=503, detail=str(e), headers=headers)
     except Exception as e:
-        print(f"Error processing request: {str(e)}")
-        print(f"Error type: {type(e)}")
+        logger.exception("Error processing request: %s", e)
         # Include more detailed error message
         raise HTTPException(status_code=500, detail=f"Error processing reviews: {str(e)}")
+
+
+
+@router.get("/analyze-reviews/jobs/{job_id}")
+# output: { job_id, status: queued | running | done | failed, url, submissions, ..., result (done) or error (failed) }
+async def analyze_reviews_job(job_id: str):
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return job.to_dict()
     
     
+@router.post("/analyze-reviews/stream")
+# input format : { url : "http:somthing.com", threshold: 0.70}
+# output: NDJSON, one {"type": "page", ...} line per page, then {"type": "done", ...} or {"type": "error", ...}
+async def analyze_reviews_stream(url_request: URLRequest):
+    logger.debug("Received request to stream analysis of url=%s", url_request.url)
+
+    async def analysis_events():
+        totals = {"reviews": 0, "real": 0, "fake": 0}
+        try:
+            async with aclosing(iter_review_pages(str(url_request.url), page_limit=url_request.page_limit, force_refresh=url_request.force_refresh)) as pages:
+                async for page_number, reviews in pages:
+                    analyzed_reviews = await detect_fake_reviews_async(reviews, threshold=url_request.threshold, model_tier=url_request.model)
+
+                    real = sum(1 for review in analyzed_reviews if review["label"])
+                    totals["reviews"] += len(analyzed_reviews)
+                    totals["real"] += real
+                    totals["fake"] += len(analyzed_reviews) - real
+
+                    yield json.dumps({"type": "page", "page": page_number, "analyzed_reviews": analyzed_reviews, "totals": totals}) + "\n"
+
+            if not totals["reviews"]:
+                yield json.dumps({"type": "error", "detail": "No reviews found."}) + "\n"
+            else:
+                yield json.dumps({"type": "done", "totals": totals}) + "\n"
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-stream
+            logger.exception("Error streaming analysis: %s", e)
+            yield json.dumps({"type": "error", "detail": f"Error processing reviews: {str(e)}"}) + "\n"
+
+    return StreamingResponse(analysis_events(), media_type="application/x-ndjson")
+
+
 @router.post("/analyze-single-review")
 async def analyze_single_review(review_request: SingleReviewRequest):
     try:
-        print(f"Received review request: {review_request}")  # Add logging
+        logger.debug("Received single review request, %d characters", len(review_request.review))
         
         reviews = [{
             "review_title": "",  # Empty title is fine
@@ -54,12 +129,14 @@ async def analyze_single_review(review_request: SingleReviewRequest):
             raise HTTPException(status_code=404, detail="No reviews sent.")
 
         # Detect fake reviews
-        analyzed_reviews = detect_fake_reviews(reviews, threshold=review_request.threshold)
-        print(f"Analysis complete: {analyzed_reviews}")  # Add logging
+        analyzed_reviews = await detect_fake_reviews_async(reviews, threshold=review_request.threshold, model_tier=review_request.model)
+        logger.debug("Analysis complete: %s", analyzed_reviews)
 
         return {"analyzed_reviews": analyzed_reviews}
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        print(f"Error processing review: {str(e)}")  # Add logging
+        logger.exception("Error processing review: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -68,21 +145,85 @@ async def analyze_single_review(review_request: SingleReviewRequest):
 # input format : { review: "Text content", threshold: ["high, medium, low"]}
 async def analyze_openapi_review(review_request: OpenAPIReviewRequest):
     try:
-        threshold_map = {
-            "high": 0.9,
-            "medium": 0.75,
-            "low": 0.65
-        }
-        mapped_threshold = threshold_map[review_request.threshold]
+        mapped_threshold = THRESHOLD_MAP[review_request.threshold]
         
         review = [{"review_text": f"{review_request.review}"}]
         
         if not review:
             raise HTTPException(status_code=404, detail="No review received.")
 
-        analyzed_reviews = api_check_fake_reviews(review, threshold=mapped_threshold)
+        analyzed_reviews = await api_check_fake_reviews_async(review, threshold=mapped_threshold, model_tier=review_request.model)
 
         return {"analyzed_reviews": analyzed_reviews}
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        print(f"Error processing review: {str(e)}")
+        logger.exception("Error processing review: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/openapi-verify-reviews")
+# input format : { reviews: [{ id: "r1", review: "Text content", threshold?: "high" }], threshold: ["high, medium, low"]}
+async def analyze_openapi_reviews(batch_request: OpenAPIBatchReviewRequest):
+    try:
+        reviews = [{
+            "id": item.id,
+            "review_text": item.review,
+            "threshold": THRESHOLD_MAP[item.threshold or batch_request.threshold]
+        } for item in batch_request.reviews]
+
+        analyzed_reviews = await api_check_fake_reviews_batch_async(reviews, model_tier=batch_request.model)
+
+        return {"analyzed_reviews": analyzed_reviews}
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.exception("Error processing review batch: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def require_feedback_key(x_api_key: Optional[str] = Header(None)):
+    """Feedback changes what the "online" model serves, so only holders of feedback_api_key may send it."""
+    if not settings.feedback_api_key:
+        raise HTTPException(status_code=403, detail="Feedback is disabled on this server.")
+    if x_api_key is None or not secrets.compare_digest(x_api_key.encode(), settings.feedback_api_key.encode()):
+        raise HTTPException(status_code=401, detail="Missing or invalid X-API-Key.")
+
+
+@router.post("/feedback", dependencies=[Depends(require_feedback_key)])
+# input format : { reviews: [{ review: "Text content", fake: true }] }, with the X-API-Key header
+# Labels are buffered and applied to the online model in batches (see FeedbackBuffer), the response
+# carries the published version when this request completed a batch, else null
+async def feedback(feedback_request: FeedbackRequest):
+    try:
+        texts = [item.review for item in feedback_request.reviews]
+        labels = ["CG" if item.fake else "OR" for item in feedback_request.reviews]
+        result = None
+        if feedback_buffer.add(texts, labels):
+            result = await asyncio.to_thread(feedback_buffer.flush)
+        return {
+            "accepted": len(texts),
+            "buffered": len(feedback_buffer),
+            "version": result["version"] if result else None,
+        }
+    except Exception as e:
+        logger.exception("Error applying feedback: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/ready")
+# 200 once the default model (and its cascade stage) is loaded, 503 before that, so load balancers hold traffic until then
+async def ready(response: Response):
+    models = loaded_models()
+    is_ready = required_tiers() <= models.keys()
+    if not is_ready:
+        response.status_code = 503
+    return {"ready": is_ready, "models": models, "crawler_pool": crawler_pool.started}
+
+
+@router.get("/cache-stats")
+async def cache_stats():
+    return {
+        "prediction_cache": prediction_cache.stats(),
+        "scrape_cache": {"entries": len(scrape_cache) if scrape_cache is not None else 0},
+    }
@@ -1,10 +1,112 @@
-from pydantic import BaseSettings
+import os
+from typing import Literal, Optional
+from pydantic import Field
+from pydantic_settings import BaseSettings
+
+# "accurate" is the RBF SVC pipeline, "fast" the calibrated linear model trained alongside it,
+# "online" a hashing SGD model updated from reviewer feedback (see services/online_model.py)
+ModelTier = Literal["accurate", "fast", "online"]
 
 class Settings(BaseSettings):
-    openai_api_key: str
+    openai_api_key: str = ""  # Only needed for LLM extraction in the scraper
     fake_review_model_path: str = "models/fake_review_model.joblib"
+    fake_review_fast_model_path: str = "models/fake_review_model_fast.joblib"
+    fake_review_online_model_path: str = "models/fake_review_model_online.joblib"
+    default_model_tier: ModelTier = "accurate"  # Used when a request doesn't pick a model
+    model_reload_interval: float = 5.0  # Seconds between checks for a new model artifact, 0 disables hot swap
+    # "compact" serves the memory mapped export next to each model path (fake_review_model.compact/),
+    # "joblib" the pickled pipeline, "auto" the compact export when there is one
+    model_format: Literal["auto", "joblib", "compact"] = "auto"
+    # How a pickled pipeline is scored: "numpy" through CompactModel's float32 kernel, built from the
+    # pipeline at load time, "sklearn" through the pipeline itself, "auto" through NumPy when its
+    # probabilities match sklearn's within kernel_parity_tolerance on a load time check.
+    # The NumPy kernel holds float32 copies of the support vectors on each worker's heap, so the
+    # memory mapped pickle is no longer shared through the page cache. With many workers, prefer
+    # "sklearn", or export a compact artifact, which is both fast and shared (see model_format).
+    kernel_backend: Literal["auto", "numpy", "sklearn"] = "auto"
+    kernel_parity_tolerance: float = 1e-4
+
+    # Inference worker: concurrent requests are collected for up to
+    # inference_batch_wait_ms and scored as one batch off the event loop
+    inference_batch_wait_ms: float = 5.0
+    inference_max_batch_size: int = 512
+    inference_queue_size: int = 1024
+    inference_pool: Literal["thread", "process"] = "thread"
+    inference_pool_workers: int = 1
+
+    # Prediction cache: an in-process LRU of prediction_cache_size entries (0 disables it),
+    # plus an optional SQLite tier shared by all workers when prediction_cache_path is set
+    prediction_cache_size: int = 100_000
+    prediction_cache_path: Optional[str] = None
+    prediction_cache_ttl: float = 7 * 24 * 3600
+
+    # Warm headless browsers launched at startup and leased per analysis,
+    # each one replaced after crawler_max_uses leases
+    crawler_pool_size: int = Field(2, ge=1)
+    crawler_max_uses: int = 50
+    crawler_headless: bool = True
+
+    # Pages crawled at the same time for one analysis, sharing a single crawler
+    scrape_concurrency: int = 4
+    max_page_limit: int = 20
+
+    # Scrape cache: validated reviews per (url, page) in SQLite, set scrape_cache_path empty to disable
+    scrape_cache_path: Optional[str] = "cache/scrape_cache.sqlite"
+    scrape_cache_ttl: float = 6 * 3600
+    scrape_cache_max_entries: int = 5000
+
+    # Analysis jobs: job_workers analyses run at once, up to job_queue_size wait for a worker,
+    # and finished jobs are kept job_ttl seconds for their results to be fetched
+    job_workers: int = 2
+    job_queue_size: int = 100
+    job_ttl: float = 3600
+
+    # LLM extraction: pages are pruned to their review region and split into chunks of at most
+    # llm_chunk_token_budget tokens. All extraction calls in a process share one client (see
+    # services/llm_client.py) with at most llm_max_concurrency calls in flight, kept under
+    # llm_requests_per_minute and llm_tokens_per_minute, and retried llm_max_retries times with
+    # jittered backoff. llm_base_url points it at another OpenAI compatible endpoint, e.g. a local stub
+    llm_chunk_token_budget: int = 1500
+    llm_base_url: Optional[str] = None
+    llm_model: str = "gpt-4o-mini"
+    llm_max_output_tokens: int = 2048
+    llm_max_concurrency: int = 8
+    llm_requests_per_minute: int = 500
+    llm_tokens_per_minute: int = 200_000
+    llm_max_retries: int = 5
+    llm_backoff_base: float = 1.0
+    llm_backoff_max: float = 30.0
+    llm_timeout: float = 60.0
+
+    # Online model: feedback is applied with partial_fit online_batch_size reviews at a time,
+    # and the newest online_snapshots_kept published snapshots are kept for rollback
+    online_batch_size: int = 256
+    online_snapshots_kept: int = 10
+    # POST /api/feedback updates a served model, so it needs feedback_api_key in an X-API-Key
+    # header and is disabled while the key is empty. Labels are buffered and published as one
+    # snapshot once feedback_min_batch are waiting, or feedback_flush_interval seconds after the
+    # oldest arrived. training/online_update.py applies files directly, without the API
+    feedback_api_key: str = ""
+    feedback_min_batch: int = 100
+    feedback_flush_interval: float = 300.0
+
+    # Cascade: opt-in, off at the default 0. With cascade_band above 0, "accurate" requests are scored
+    # by cascade_first_tier first, and only reviews whose probability lies within cascade_band of their
+    # threshold are rescored by the accurate model. Start from 0.2, trading some agreement with the
+    # accurate model for latency, and check it for your models with benchmarks/run_benchmarks.py
+    # --cascade-dataset, which reports agreement, accuracy and speedup per band
+    cascade_band: float = 0.0
+    cascade_first_tier: ModelTier = "fast"
+
+    # Near duplicates: reviews whose word shingle_size-grams overlap by at least duplicate_threshold
+    # (estimated Jaccard similarity) share a cluster_id in the analysis results
+    duplicate_threshold: float = 0.5
+    duplicate_shingle_size: int = 3
+
+    log_level: str = "INFO"  # DEBUG logs every request, see main.py
 
     class Config:
-        env_file = ".env"  # Loads variables from the .env file
+        # backend/.env, wherever the app is started from (like load_dotenv's search from the package)
+        env_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env")
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -1,9 +1,50 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from .config import settings
 from .api.routes import router  # Import the routes
+from .services.metrics import REQUEST_SECONDS, render_metrics
+from .services.review_classifier import inference_workers, preload_models
+from .services.browser_pool import crawler_pool
+from .services.jobs import analysis_jobs
+from .services.llm_client import llm_client
+from .services.online_model import feedback_buffer
+
+# key=value lines; per-request details are logged at DEBUG, so they cost nothing at the default level
+logging.basicConfig(
+    level=settings.log_level.upper(),
+    format="time=%(asctime)s level=%(levelname)s logger=%(name)s msg=%(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the models once per worker, before the first request; /api/ready reports when done
+    versions = await asyncio.to_thread(preload_models)
+    logger.info("Preloaded models: %s", versions)
+    # Score reviews in micro-batches off the event loop for the app's lifetime
+    for worker in inference_workers.values():
+        await worker.start()
+    # Launch the headless browsers up front so scrapes never pay for a cold start
+    await crawler_pool.start()
+    await analysis_jobs.start()
+    await feedback_buffer.start()
+    yield
+    await feedback_buffer.stop()
+    await analysis_jobs.stop()
+    await llm_client.aclose()
+    await crawler_pool.stop()
+    for worker in inference_workers.values():
+        await worker.stop()
+
 
 # Initialize the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS to allow React frontend communication
 app.add_middleware(
@@ -14,9 +55,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # The route template, not the raw path, so job ids don't each become a series
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status,
+        )
+
 # Include the API router
 app.include_router(router)
 
+# Prometheus scrape target
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # Add this for debugging
 @app.get("/")
 async def root():
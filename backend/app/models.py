@@ -1,18 +1,52 @@
-from pydantic import BaseModel, Field, HttpUrl
-from typing import Literal
+from pydantic import BaseModel, Field, HttpUrl, field_validator
+from typing import Literal, Optional
+from .config import ModelTier, settings
 
 # @router.post("/analyze-reviews")
 class URLRequest(BaseModel):
     url: HttpUrl = Field(..., description="The URL to extract reviews from.")
     threshold: float = Field(0.7, description="Confidence threshold for labeling a review as fake.")
+    model: Optional[ModelTier] = Field(None, description="Model to score with, \"accurate\", \"fast\" or \"online\". Defaults to the server setting.")
+    page_limit: int = Field(1, ge=1, le=settings.max_page_limit, description="Maximum number of review pages to crawl.")
+    force_refresh: bool = Field(False, description="Re-crawl the pages instead of using cached reviews.")
+    job: bool = Field(False, description="Run the analysis as a background job and return its id instead of the results.")
 
 # @router.post("/analyze-single-review")
 class SingleReviewRequest(BaseModel):
     review: str = Field(..., description="Review text content.")
     threshold: float = Field(0.7, description="Confidence threshold for labeling a review as fake.")
     rating: str = Field(..., pattern=r'^\d/5$')  # Only allows ratings like "1/5", "2/5", etc.
+    model: Optional[ModelTier] = Field(None, description="Model to score with, \"accurate\", \"fast\" or \"online\". Defaults to the server setting.")
     
 # @router.post("/openapi-verify-review")  
 class OpenAPIReviewRequest(BaseModel):
     review: str = Field(..., description="Review text content.")
     threshold: Literal["high", "medium", "low"] = Field("medium", description="Confidence threshold for labeling a review as fake.")
+    model: Optional[ModelTier] = Field(None, description="Model to score with, \"accurate\", \"fast\" or \"online\". Defaults to the server setting.")
+
+# @router.post("/openapi-verify-reviews")
+class OpenAPIBatchReviewItem(BaseModel):
+    id: str = Field(..., description="Caller supplied identifier, used to key the result.")
+    review: str = Field(..., description="Review text content.")
+    threshold: Optional[Literal["high", "medium", "low"]] = Field(None, description="Overrides the batch threshold for this review.")
+
+class OpenAPIBatchReviewRequest(BaseModel):
+    reviews: list[OpenAPIBatchReviewItem] = Field(..., min_length=1, max_length=10000, description="Reviews to classify in one call.")
+    threshold: Literal["high", "medium", "low"] = Field("medium", description="Default threshold for reviews that don't set their own.")
+    model: Optional[ModelTier] = Field(None, description="Model to score with, \"accurate\", \"fast\" or \"online\". Defaults to the server setting.")
+
+    @field_validator("reviews")
+    @classmethod
+    def unique_ids(cls, reviews):
+        ids = [review.id for review in reviews]
+        if len(ids) != len(set(ids)):
+            raise ValueError("Review ids must be unique within a batch.")
+        return reviews
+
+# @router.post("/feedback")
+class FeedbackItem(BaseModel):
+    review: str = Field(..., min_length=1, description="Review text content.")
+    fake: bool = Field(..., description="Reviewer confirmed label, true for a fake (computer generated) review.")
+
+class FeedbackRequest(BaseModel):
+    reviews: list[FeedbackItem] = Field(..., min_length=1, max_length=10000, description="Labelled reviews to apply to the online model.")
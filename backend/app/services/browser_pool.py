@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _new_crawler(headless):
+    # crawl4ai brings in playwright and friends, so it is only imported once a browser is needed
+    from crawl4ai import AsyncWebCrawler
+    return AsyncWebCrawler(verbose=True, headless=headless)
+
+
+class CrawlerPool:
+    """
+    Pool of warm, headless AsyncWebCrawler instances.
+
+    Browsers are launched once when the app starts. Requests lease a crawler and
+    give it back when done, so browser launch time is out of request latency and
+    the number of browsers (and their memory) is capped at the pool size. A
+    crawler is closed and replaced after max_uses leases, which bounds the
+    memory a long lived browser accumulates. The replacement is launched in
+    the background, so no request waits for a browser to start.
+    """
+
+    def __init__(self, size=None, max_uses=None, headless=None):
+        self.size = settings.crawler_pool_size if size is None else size
+        if self.size < 1:
+            # An empty pool would make every lease wait forever for a crawler
+            raise ValueError(f"Crawler pool size must be at least 1, got {self.size}")
+        self.max_uses = max_uses or settings.crawler_max_uses
+        self.headless = settings.crawler_headless if headless is None else headless
+
+        self._idle = None
+        self._uses = {}  # Every live crawler, idle or leased, and how often it was leased
+        self._launching = 0
+        self._replacing = set()  # Background tasks relaunching retired crawlers
+        self._started = False
+
+    @property
+    def started(self):
+        return self._started
+
+    async def _launch(self):
+        self._launching += 1
+        try:
+            crawler = _new_crawler(self.headless)
+            await crawler.__aenter__()
+        finally:
+            self._launching -= 1
+        self._uses[crawler] = 0
+        return crawler
+
+    async def _close(self, crawler):
+        self._uses.pop(crawler, None)
+        try:
+            await crawler.__aexit__(None, None, None)
+        except Exception as e:
+            logger.warning("Error closing crawler: %s", e)
+
+    async def _replace(self, crawler):
+        """Close a retired crawler and put a fresh one in the idle queue."""
+        self._launching += 1  # Hold the slot while the old browser closes
+        try:
+            await self._close(crawler)
+        finally:
+            self._launching -= 1
+        try:
+            replacement = await self._launch()
+        except Exception as e:
+            logger.warning("Error relaunching crawler: %s", e)
+            # None wakes a waiting lease, which launches the missing crawler itself
+            replacement = None
+        if self._started:
+            self._idle.put_nowait(replacement)
+        elif replacement is not None:
+            await self._close(replacement)
+
+    async def start(self):
+        """Launch size browsers and keep them idle until leased."""
+        if self._started:
+            return
+        self._idle = asyncio.Queue()
+        crawlers = await asyncio.gather(*(self._launch() for _ in range(self.size)))
+        for crawler in crawlers:
+            self._idle.put_nowait(crawler)
+        self._started = True
+        logger.info("Crawler pool started with %d browser(s)", self.size)
+
+    async def stop(self):
+        """Close idle browsers. Leased ones are closed when they come back."""
+        if not self._started:
+            return
+        self._started = False
+        await asyncio.gather(*self._replacing, return_exceptions=True)
+        while not self._idle.empty():
+            crawler = self._idle.get_nowait()
+            if crawler is not None:
+                await self._close(crawler)
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        Borrow a crawler for the duration of the block.
+
+        Waits for a free crawler when all are leased. Without a started pool
+        (scripts, tests) a throwaway crawler is launched and closed instead.
+        """
+        if not self._started:
+            async with _new_crawler(self.headless) as crawler:
+                yield crawler
+            return
+
+        if self._idle.empty() and len(self._uses) + self._launching < self.size:
+            # A launch failed earlier and left the pool short, so top it up
+            crawler = None
+        else:
+            crawler = await self._idle.get()
+        if crawler is None:
+            try:
+                crawler = await self._launch()
+            except BaseException:
+                # Pass the empty slot on, so other waiting leases don't wait forever
+                self._idle.put_nowait(None)
+                raise
+        try:
+            yield crawler
+        finally:
+            self._uses[crawler] += 1
+            if not self._started:
+                await self._close(crawler)
+            elif self._uses[crawler] >= self.max_uses:
+                task = asyncio.create_task(self._replace(crawler))
+                self._replacing.add(task)
+                task.add_done_callback(self._replacing.discard)
+            else:
+                self._idle.put_nowait(crawler)
+
+
+crawler_pool = CrawlerPool()
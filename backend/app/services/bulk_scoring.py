@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import get_args
+from ..config import ModelTier, settings
+from .cache import prediction_cache
+from .review_classifier import cascade_tiers, get_classifier, score_stages
+
+# Scores review dumps too large for memory: python -m app.services.bulk_scoring reviews.csv scores.csv
+#
+# The input is read in chunks of --chunk-size rows and the chunks are scored across a process pool,
+# at most two per worker in flight. Results are appended to the output in input order, and after
+# every chunk a checkpoint next to the output records how far it got, so an interrupted run picks
+# up where it stopped with --resume.
+
+CHECKPOINT_VERSION = 1
+
+
+def _file_format(path):
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_chunks(path, chunk_size, columns):
+    """Yield DataFrames of at most chunk_size rows from a CSV or JSON lines file."""
+    import pandas as pd
+
+    if _file_format(path) == "jsonl":
+        reader = pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+    else:
+        reader = pd.read_csv(path, chunksize=chunk_size, usecols=lambda column: column in columns, dtype=str, keep_default_na=False)
+    with reader:
+        yield from reader
+
+
+def _init_worker(model_tier):
+    # Every row of a dump is scored once, so caching predictions would only cost memory (and
+    # disk writes with a shared cache). The models are loaded before the first chunk arrives.
+    prediction_cache.memory.max_entries = 0
+    prediction_cache.disk = None
+    for tier in cascade_tiers(model_tier) or (model_tier,):
+        get_classifier(tier).load()
+
+
+def score_chunk(texts, model_tier, threshold):
+    """Fake probability and deciding tier per text, run in a pool worker. Cascades like the API."""
+    return score_stages(texts, threshold, model_tier)
+
+
+class Checkpoint:
+    """Rows and output bytes written so far, for resuming an interrupted run."""
+
+    def __init__(self, output_path):
+        self.path = output_path + ".checkpoint"
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, state):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def format_rows(chunk, scores, start_row, args):
+    """Output records for one scored chunk, labelled like the API results."""
+    probabilities, stages = scores
+    rows = []
+    for offset, (probability, stage) in enumerate(zip(probabilities, stages)):
+        row = {"row": start_row + offset}
+        if args.id_column:
+            value = chunk[args.id_column].iloc[offset]
+            # NumPy scalars to plain Python ones, so JSON keeps numbers as numbers
+            row[args.id_column] = value.item() if hasattr(value, "item") else value
+        row["fake_probability"] = round(float(probability), 6)
+        row["confidence"] = round(probability * 100)
+        row["label"] = bool(probability < args.threshold)  # True if original, else generated
+        row["stage"] = stage  # Model tier that decided the label
+        rows.append(row)
+    return rows
+
+
+def write_rows(f, rows, output_format, header):
+    if output_format == "jsonl":
+        f.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+        return
+    import csv
+
+    writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+
+
+def run(args):
+    """
+    Score args.input into args.output.
+
+    Returns:
+        int: Rows scored by this run, not counting rows a resumed run skipped.
+    """
+    columns = {args.text_column, args.title_column, args.id_column} - {None}
+    output_format = _file_format(args.output)
+    checkpoint = Checkpoint(args.output)
+    state = {
+        "version": CHECKPOINT_VERSION,
+        "input": os.path.abspath(args.input),
+        "input_size": os.path.getsize(args.input),
+        "chunk_size": args.chunk_size,
+        "chunks": 0,
+        "rows": 0,
+        "output_bytes": 0,
+    }
+
+    if args.resume and (saved := checkpoint.load()) is not None:
+        identity = ("version", "input", "input_size", "chunk_size")
+        if any(saved.get(key) != state[key] for key in identity):
+            raise SystemExit(f"{checkpoint.path} was written for a different input or --chunk-size, remove it to start over")
+        state = saved
+        print(f"Resuming after {state['rows']} rows ({state['chunks']} chunks)", file=sys.stderr)
+    if state["output_bytes"]:
+        # The checkpoint only counts rows that are in the output, a lost or cut short one can't be resumed
+        if not os.path.exists(args.output):
+            raise SystemExit(f"{args.output} is missing, remove {checkpoint.path} to start over")
+        if os.path.getsize(args.output) < state["output_bytes"]:
+            raise SystemExit(f"{args.output} is shorter than {checkpoint.path} records, remove the checkpoint to start over")
+    mode = "r+" if state["output_bytes"] else "w"
+
+    with open(args.output, mode, newline="", encoding="utf-8") as f, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.model,)) as executor:
+        # Drop anything written after the last checkpoint, it is scored again
+        f.seek(state["output_bytes"])
+        f.truncate()
+
+        started = time.perf_counter()
+        scored = 0
+        pending = []
+        max_pending = 2 * (args.workers or os.cpu_count() or 1)
+        chunks = read_chunks(args.input, args.chunk_size, columns)
+
+        def write_oldest():
+            nonlocal scored
+            chunk, start_row, future = pending.pop(0)
+            rows = format_rows(chunk, future.result(), start_row, args)
+            write_rows(f, rows, output_format, header=state["chunks"] == 0)
+            f.flush()
+            os.fsync(f.fileno())
+            state.update(chunks=state["chunks"] + 1, rows=state["rows"] + len(rows), output_bytes=f.tell())
+            checkpoint.save(state)
+            scored += len(rows)
+            elapsed = time.perf_counter() - started
+            print(f"{state['rows']} rows scored, {scored / elapsed:.0f} rows/s", file=sys.stderr, flush=True)
+
+        start_row = 0
+        for index, chunk in enumerate(chunks):
+            if index < state["chunks"]:
+                start_row += len(chunk)
+                continue
+            texts = chunk[args.text_column].fillna("").astype(str)
+            if args.title_column:
+                texts = chunk[args.title_column].fillna("").astype(str) + " " + texts
+            pending.append((chunk, start_row, executor.submit(score_chunk, texts.tolist(), args.model, args.threshold)))
+            start_row += len(chunk)
+            # Bounded look ahead keeps memory flat however large the input is
+            while len(pending) >= max_pending:
+                write_oldest()
+        while pending:
+            write_oldest()
+
+    checkpoint.remove()
+    elapsed = time.perf_counter() - started
+    print(f"Done: {scored} rows in {elapsed:.1f}s ({scored / elapsed if elapsed else 0:.0f} rows/s), {state['rows']} rows in {args.output}", file=sys.stderr)
+    return scored
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV or JSON lines review dump for fake reviews.")
+    parser.add_argument("input", help="CSV or JSON lines (.jsonl) file of reviews.")
+    parser.add_argument("output", help="Where the scores are written, JSON lines if it ends in .jsonl, else CSV.")
+    parser.add_argument("--text-column", default="review_text")
+    parser.add_argument("--title-column", default=None, help="Prepended to the text, like the title of scraped reviews.")
+    parser.add_argument("--id-column", default=None, help="Copied to the output next to the row number.")
+    parser.add_argument("--threshold", type=float, default=0.7, help="Confidence threshold for labeling a review as fake.")
+    parser.add_argument("--model", choices=get_args(ModelTier), default=settings.default_model_tier)
+    parser.add_argument("--workers", type=int, default=None, help="Scoring processes, defaults to the CPU count.")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per chunk, and per checkpoint.")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint of an interrupted run.")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
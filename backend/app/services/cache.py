@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from ..config import settings
+from .metrics import CACHE_LOOKUPS
+
+
+class LRUCache:
+    """Thread safe, size bounded in-process cache. Evicts the least recently used entry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys):
+        """Return a dict of the keys that are cached, marking them as recently used."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        return found
+
+    def set_many(self, items):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """
+    On-disk key/value cache with TTL expiry, shared by every worker on the host.
+
+    Values are stored as JSON. Expired rows are never returned and are purged
+    (together with the oldest rows beyond max_entries) every purge_every writes.
+    The database file and its directory are only created on first use, so
+    importing a module that defines a cache doesn't write anything.
+    """
+
+    def __init__(self, path, table, ttl, max_entries=None, purge_every=1000):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.purge_every = purge_every
+
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self):
+        # Connections must not cross a fork, so every process opens its own
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            with conn:
+                # WAL lets several server processes read while one writes
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, created_at REAL NOT NULL)"
+                )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_expires_at ON {self.table} (expires_at)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def get_many(self, keys):
+        """Return a dict of the keys that have an unexpired entry."""
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with self._lock:
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders}) AND expires_at > ?",
+                    (*chunk, now),
+                )
+                for key, value in rows:
+                    found[key] = json.loads(value)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items, ttl=None):
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        rows = [(key, json.dumps(value), expires_at, now) for key, value in items.items()]
+        with self._lock, self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)", rows)
+            self._writes += len(rows)
+            if self._writes >= self.purge_every:
+                self._writes = 0
+                self._purge(now)
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl=ttl)
+
+    def delete(self, key):
+        with self._lock, self.conn:
+            self.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def _purge(self, now):
+        self.conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+        if self.max_entries:
+            self.conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+def normalize_review_text(text):
+    # Case and whitespace never change the model's input, so they shouldn't change the key
+    return " ".join(str(text).lower().split())
+
+
+class PredictionCache:
+    """
+    Content addressed cache of fake probabilities.
+
+    Keys hash the normalized review text together with the model version, so a
+    hot swapped model never serves stale scores. Only probabilities are cached;
+    thresholds and labels are applied per request by the callers.
+    """
+
+    def __init__(self, max_entries=None, path=None, ttl=None):
+        self.memory = LRUCache(settings.prediction_cache_size if max_entries is None else max_entries)
+        path = path if path is not None else settings.prediction_cache_path
+        self.disk = SQLiteCache(path, "predictions", settings.prediction_cache_ttl if ttl is None else ttl) if path else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.memory.max_entries > 0 or self.disk is not None
+
+    @staticmethod
+    def key(text, model_version):
+        return hashlib.sha256(f"{model_version}\x00{normalize_review_text(text)}".encode()).hexdigest()
+
+    def get_many(self, keys):
+        """Look keys up in memory first, then on disk. Disk hits are promoted to memory."""
+        found = self.memory.get_many(keys)
+        disk_found = {}
+        if self.disk is not None and len(found) < len(keys):
+            disk_found = self.disk.get_many(key for key in keys if key not in found)
+            self.memory.set_many(disk_found)
+            found.update(disk_found)
+
+        hits = sum(1 for key in keys if key in found)
+        with self._stats_lock:
+            self.hits += hits
+            self.disk_hits += len(disk_found)
+            self.misses += len(keys) - hits
+        CACHE_LOOKUPS.inc(hits - len(disk_found), cache="prediction", result="memory_hit")
+        CACHE_LOOKUPS.inc(len(disk_found), cache="prediction", result="disk_hit")
+        CACHE_LOOKUPS.inc(len(keys) - hits, cache="prediction", result="miss")
+        return found
+
+    def set_many(self, items):
+        self.memory.set_many(items)
+        if self.disk is not None:
+            self.disk.set_many(items)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_entries": len(self.memory),
+        }
+
+
+prediction_cache = PredictionCache()
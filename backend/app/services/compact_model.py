@@ -0,0 +1,337 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+# Compact, memory mappable form of the trained pipelines (CountVectorizer -> TfidfTransformer -> classifier).
+#
+# An artifact is a directory of .npy files plus meta.json. Arrays are float32 and are opened with
+# np.load(mmap_mode="r"), so every worker on a host shares one copy in the page cache instead of
+# unpickling its own. The vocabulary dict becomes a sorted array of 64 bit token hashes, and the
+# SVC's support vectors are stored sparse, as the TF-IDF rows they are.
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+
+
+def token_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+
+
+def _vocabulary_arrays(vocabulary):
+    hashes = np.fromiter((token_hash(term) for term in vocabulary), dtype=np.uint64, count=len(vocabulary))
+    indices = np.fromiter(vocabulary.values(), dtype=np.int32, count=len(vocabulary))
+    order = np.argsort(hashes)
+    hashes, indices = hashes[order], indices[order]
+    if len(hashes) > 1 and np.any(hashes[1:] == hashes[:-1]):
+        raise ValueError("Vocabulary token hashes collide, the compact artifact can't represent this vocabulary.")
+    return hashes, indices
+
+
+def _classifier_arrays(classifier):
+    """Return (kind, arrays, meta) for an SVC or a sigmoid calibrated linear model."""
+    name = type(classifier).__name__
+    if name == "SVC":
+        if classifier.kernel != "rbf" or len(classifier.classes_) != 2 or not classifier.probability:
+            raise ValueError("Only binary RBF SVCs trained with probability=True can be exported.")
+        from scipy import sparse
+        support_vectors = sparse.csr_matrix(classifier.support_vectors_, dtype=np.float32)
+        # Sparse when the SVC was fit on sparse TF-IDF rows
+        dual_coef = classifier.dual_coef_.toarray() if sparse.issparse(classifier.dual_coef_) else classifier.dual_coef_
+        arrays = {
+            "sv_data": support_vectors.data,
+            "sv_indices": support_vectors.indices.astype(np.int32),
+            "sv_indptr": support_vectors.indptr.astype(np.int64),
+            "sv_sq_norms": np.asarray(support_vectors.multiply(support_vectors).sum(axis=1), dtype=np.float32).ravel(),
+            "dual_coef": np.asarray(dual_coef, dtype=np.float32).ravel(),
+        }
+        meta = {
+            "gamma": float(classifier._gamma),
+            "intercept": float(classifier.intercept_[0]),
+            "prob_a": float(classifier.probA_[0]),
+            "prob_b": float(classifier.probB_[0]),
+            "n_support_vectors": int(support_vectors.shape[0]),
+        }
+        return "svc", arrays, meta
+
+    if name == "CalibratedClassifierCV":
+        if len(classifier.calibrated_classifiers_) != 1 or classifier.method != "sigmoid":
+            raise ValueError("Only sigmoid calibrated models trained with ensemble=False can be exported.")
+        calibrated = classifier.calibrated_classifiers_[0]
+        estimator = calibrated.estimator
+        calibrator = calibrated.calibrators[0]
+        arrays = {"coef": np.asarray(estimator.coef_, dtype=np.float32).ravel()}
+        meta = {
+            "intercept": float(estimator.intercept_[0]),
+            "calibration_a": float(calibrator.a_),
+            "calibration_b": float(calibrator.b_),
+        }
+        return "linear", arrays, meta
+
+    raise ValueError(f"Can't export a {name} classifier.")
+
+
+def compact_arrays(pipeline):
+    """
+    Return the (meta, arrays) that represent a trained pipeline, see export_compact_model.
+
+    Raises:
+        ValueError: The pipeline's classifier can't be represented.
+    """
+    if not {"bow", "tfidf", "classifier"} <= pipeline.named_steps.keys():
+        raise ValueError("Only bow -> tfidf -> classifier pipelines can be exported.")
+    vectorizer = pipeline.named_steps["bow"]
+    tfidf = pipeline.named_steps["tfidf"]
+    classifier = pipeline.named_steps["classifier"]
+
+    kind, arrays, meta = _classifier_arrays(classifier)
+    arrays["vocab_hashes"], arrays["vocab_indices"] = _vocabulary_arrays(vectorizer.vocabulary_)
+    if tfidf.use_idf:
+        arrays["idf"] = np.asarray(tfidf.idf_, dtype=np.float32)
+
+    meta.update({
+        "format_version": FORMAT_VERSION,
+        "kind": kind,
+        "classes": [str(label) for label in classifier.classes_],
+        "n_features": len(vectorizer.vocabulary_),
+        "binary": bool(vectorizer.binary),
+        "norm": tfidf.norm,
+        "sublinear_tf": bool(tfidf.sublinear_tf),
+    })
+    return meta, arrays
+
+
+def export_compact_model(pipeline, path):
+    """
+    Write a trained pipeline as a compact artifact directory at path.
+
+    The artifact is written next to path and moved into place, replacing any
+    previous one. meta.json is written last, so a directory with meta.json is
+    always complete.
+
+    Args:
+        pipeline (sklearn.pipeline.Pipeline): Steps bow (CountVectorizer), tfidf
+            (TfidfTransformer) and classifier (SVC or CalibratedClassifierCV).
+        path (str): Artifact directory to create.
+    """
+    meta, arrays = compact_arrays(pipeline)
+
+    path = os.path.normpath(path)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(tmp_path, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # Directories can't be swapped in one rename. The serving side keeps its current
+    # model while path is briefly missing, and mapped files outlive their deletion.
+    old_path = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def _couple_pairwise(r, max_iter=100, eps=0.0025):
+    """
+    libsvm's multiclass_probability for two classes, vectorized over samples.
+
+    sklearn's libsvm couples pairwise probabilities iteratively even when there
+    are only two classes, stopping within eps, so its output is up to a few
+    thousandths away from the pairwise probability r itself.
+    """
+    p = np.full((len(r), 2), 0.5)
+    q = np.empty((len(r), 2, 2))
+    q[:, 0, 0] = (1 - r) ** 2
+    q[:, 1, 1] = r ** 2
+    q[:, 0, 1] = q[:, 1, 0] = -(1 - r) * r
+    active = np.ones(len(r), dtype=bool)
+    for _ in range(max_iter):
+        qp = np.einsum("nij,nj->ni", q, p)
+        pqp = (p * qp).sum(axis=1)
+        active &= np.abs(qp - pqp[:, None]).max(axis=1) >= eps
+        if not active.any():
+            break
+        for t in range(2):
+            diff = np.where(active, (pqp - qp[:, t]) / q[:, t, t], 0.0)
+            p[:, t] += diff
+            pqp = (pqp + diff * (diff * q[:, t, t] + 2 * qp[:, t])) / (1 + diff) / (1 + diff)
+            qp = (qp + diff[:, None] * q[:, t, :]) / (1 + diff)[:, None]
+            p /= (1 + diff)[:, None]
+    return p[:, 0]
+
+
+class CompactModel:
+    """
+    Scores preprocessed reviews from a compact artifact, see export_compact_model.
+
+    Mirrors the predict_proba and classes_ of the pipeline it was exported from,
+    so ReviewClassifier can serve either one. Everything the RBF kernel needs is
+    prepared once: float32 support vectors and their squared norms, so a batch is
+    scored with one sparse product and a vectorized exp.
+    """
+
+    def __init__(self, meta, arrays, vectorizer=None):
+        self.meta = meta
+        self.arrays = arrays
+        # The fitted bow -> tfidf steps, when built from a pipeline, see from_pipeline
+        self.vectorizer = vectorizer
+        self.kind = meta["kind"]
+        self.classes_ = np.array(meta["classes"])
+        self.n_features = meta["n_features"]
+
+        if self.kind == "svc":
+            from scipy import sparse
+            self.support_vectors = sparse.csr_matrix(
+                (arrays["sv_data"], arrays["sv_indices"], arrays["sv_indptr"]),
+                shape=(meta["n_support_vectors"], self.n_features),
+                copy=False,
+            )
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model format {meta.get('format_version')} in {path}")
+        arrays = {
+            name[:-len(".npy")]: np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+            for name in os.listdir(path) if name.endswith(".npy")
+        }
+        return cls(meta, arrays)
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """
+        Build the same model in memory from a trained pipeline, see compact_arrays.
+
+        The pipeline's own vectorizer is kept for transform, its vocabulary lookup is
+        already in memory and is faster than hashing every token.
+        """
+        meta, arrays = compact_arrays(pipeline)
+        return cls(meta, arrays, vectorizer=pipeline[:-1])
+
+    def transform(self, texts):
+        """TF-IDF rows for whitespace tokenized, preprocessed texts, as a float32 CSR matrix."""
+        from scipy import sparse
+
+        if self.vectorizer is not None:
+            return sparse.csr_matrix(self.vectorizer.transform(texts), dtype=np.float32)
+
+        rows, tokens = [], []
+        for row, text in enumerate(texts):
+            words = text.split()
+            tokens.extend(words)
+            rows.extend([row] * len(words))
+
+        if not tokens:
+            return sparse.csr_matrix((len(texts), self.n_features), dtype=np.float32)
+
+        # Hash each distinct token once and find it in the sorted vocabulary hashes
+        unique_tokens, inverse = np.unique(np.array(tokens, dtype=object), return_inverse=True)
+        hashes = np.fromiter((token_hash(token) for token in unique_tokens), dtype=np.uint64, count=len(unique_tokens))
+        vocab_hashes = self.arrays["vocab_hashes"]
+        positions = np.minimum(np.searchsorted(vocab_hashes, hashes), len(vocab_hashes) - 1)
+        known = vocab_hashes[positions] == hashes
+        columns = np.where(known, self.arrays["vocab_indices"][positions], -1)[inverse.ravel()]
+
+        rows = np.asarray(rows, dtype=np.int64)
+        keep = columns >= 0
+        counts = sparse.csr_matrix(
+            (np.ones(int(keep.sum()), dtype=np.float32), (rows[keep], columns[keep])),
+            shape=(len(texts), self.n_features),
+        )
+        counts.sum_duplicates()
+
+        if self.meta["binary"]:
+            counts.data[:] = 1
+        if self.meta["sublinear_tf"]:
+            np.log(counts.data, out=counts.data)
+            counts.data += 1
+        if "idf" in self.arrays:
+            counts.data *= self.arrays["idf"][counts.indices]
+        if self.meta["norm"] == "l2":
+            norms = np.sqrt(np.asarray(counts.multiply(counts).sum(axis=1), dtype=np.float32).ravel())
+        elif self.meta["norm"] == "l1":
+            norms = np.asarray(abs(counts).sum(axis=1), dtype=np.float32).ravel()
+        else:
+            norms = None
+        if norms is not None:
+            norms[norms == 0] = 1
+            counts.data /= np.repeat(norms, np.diff(counts.indptr))
+        return counts
+
+    def decision_function(self, texts):
+        return self.decision_function_features(self.transform(texts))
+
+    def decision_function_features(self, features):
+        if self.kind == "linear":
+            return features @ self.arrays["coef"] + self.meta["intercept"]
+
+        # RBF kernel from squared distances: ||x||^2 + ||sv||^2 - 2 x.sv
+        sq_norms = np.asarray(features.multiply(features).sum(axis=1), dtype=np.float32).ravel()
+        distances = (features @ self.support_vectors.T).toarray()
+        distances *= -2
+        distances += sq_norms[:, None]
+        distances += self.arrays["sv_sq_norms"][None, :]
+        np.maximum(distances, 0, out=distances)
+        distances *= -self.meta["gamma"]
+        kernel = np.exp(distances, out=distances)
+        return kernel @ self.arrays["dual_coef"] + self.meta["intercept"]
+
+    def predict_proba(self, texts):
+        """Probabilities of classes_[0] and classes_[1] per text, like the exported pipeline."""
+        return self.predict_proba_features(self.transform(texts))
+
+    def predict_proba_features(self, features):
+        """predict_proba for rows already produced by transform."""
+        decision = np.asarray(self.decision_function_features(features), dtype=np.float64)
+        if self.kind == "linear":
+            positive = 1.0 / (1.0 + np.exp(self.meta["calibration_a"] * decision + self.meta["calibration_b"]))
+            first = 1.0 - positive
+        else:
+            # libsvm's Platt scaling on its own sign convention (the negated public decision value),
+            # clipped the way libsvm clips pairwise probabilities
+            pairwise = 1.0 / (1.0 + np.exp(-self.meta["prob_a"] * decision + self.meta["prob_b"]))
+            first = _couple_pairwise(np.clip(pairwise, 1e-7, 1 - 1e-7))
+        return np.column_stack([first, 1.0 - first])
+
+
+def parity_documents(model, count=64, words=40, seed=0):
+    """
+    Preprocessed documents for check_parity, drawn from the model's own vocabulary.
+
+    Includes an empty document and one made only of unknown words.
+    """
+    vocabulary = np.array(sorted(model.named_steps["bow"].vocabulary_), dtype=object)
+    rng = np.random.default_rng(seed)
+    documents = [" ".join(rng.choice(vocabulary, size=rng.integers(1, words + 1))) for _ in range(count)]
+    return documents + ["", "qqqunknown zzzunknown"]
+
+
+def check_parity(pipeline, model, documents=None, tolerance=1e-4):
+    """
+    Compare model's probabilities with the sklearn pipeline's on the same documents.
+
+    Returns:
+        tuple: (bool whether every probability is within tolerance, the largest difference)
+    """
+    documents = parity_documents(pipeline) if documents is None else documents
+    if list(model.classes_) != [str(label) for label in pipeline.classes_]:
+        return False, float("inf")
+    difference = float(np.max(np.abs(model.predict_proba(documents) - pipeline.predict_proba(documents))))
+    return difference <= tolerance, difference
+
+
+if __name__ == "__main__":
+    # Convert an existing joblib pipeline: python -m app.services.compact_model models/fake_review_model.joblib
+    import sys
+    import joblib
+
+    source = sys.argv[1]
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source)[0] + ".compact"
+    export_compact_model(joblib.load(source), target)
+    print(f"Compact model written to {target}")
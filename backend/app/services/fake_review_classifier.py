@@ -1,20 +1,12 @@
-import joblib
-import string
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import nltk
-
-# Ensure NLTK stopwords are downloaded
-nltk.download('stopwords')
-nltk.download('punkt')
-stop_words = set(stopwords.words('english'))
-
-# Load the pre-trained model
-loaded_model = joblib.load('./models/fake_review_model.joblib')
+import asyncio
+from .review_classifier import score_stages, score_stages_async
+from .preprocessing import preprocess_batch
+from .near_duplicates import annotate_duplicates
+from .metrics import STAGE_SECONDS
 
 def preprocess_reviews(reviews_list):
     """
-    Preprocess reviews by combining title and text, removing punctuation, and filtering out stopwords.
+    Preprocess reviews by combining title and text, removing punctuation, filtering out stopwords and stemming.
 
     Args:
         reviews_list (list): A list of dictionaries containing review titles and texts.
@@ -22,45 +14,54 @@ def preprocess_reviews(reviews_list):
     Returns:
         list: A list of preprocessed review strings.
     """
-    processed_reviews = []
+    # Combine title and text
+    return preprocess_batch([review_dict["review_title"] + " " + review_dict["review_text"] for review_dict in reviews_list])
+
+def format_results(reviews_list, probabilities, threshold, stages):
+    results = []
     
-    for review_dict in reviews_list:
-        # Combine title and text
-        combined_text = review_dict["review_title"] + " " + review_dict["review_text"]
-        # Remove punctuation and stop words
-        tokens = word_tokenize(combined_text)
-        filtered_tokens = [word.lower() for word in tokens if word.lower() not in stop_words and word not in string.punctuation]
-        processed_reviews.append(" ".join(filtered_tokens))
+    for review_dict, probability, stage in zip(reviews_list, probabilities, stages):
+        datum = {
+            "review_text": review_dict["review_title"] +  " : " +  review_dict["review_text"],
+            "confidence": round(probability * 100),  # Confidence percentage
+            "label": bool(probability < threshold),  # True if original, else generated
+            "rating": review_dict["rating"],
+            "stage": stage,  # Model tier that decided the label
+        }
+        results.append(datum)
     
-    return processed_reviews
+    return results
 
-def detect_fake_reviews(reviews_list, threshold=0.70):
+def flag_duplicates(results, texts):
+    # Reviews are compared with each other, not only scored one by one
+    with STAGE_SECONDS.time(stage="deduplication"):
+        return annotate_duplicates(results, texts)
+
+def detect_fake_reviews(reviews_list, threshold=0.70, model_tier=None):
     """
     Detect fake reviews from a list of reviews.
 
     Args:
         reviews_list (list): A list of dictionaries containing review titles and texts.
         threshold (float): Confidence threshold for labeling a review as fake.
+        model_tier (str): "accurate", "fast" or "online", defaults to settings.default_model_tier.
 
     Returns:
-        list: A list of dictionaries containing review text, confidence, label, and rating.
+        list: A list of dictionaries containing review text, confidence, label, rating, the model
+            tier that decided it (stage, see review_classifier.score_stages), and the near
+            duplicate cluster_id and duplication_score (see near_duplicates).
     """
-    # Preprocess reviews
-    test_data = preprocess_reviews(reviews_list)
+    # Combine title and text, labels and confidences both come from one probability pass
+    texts = [review_dict["review_title"] + " " + review_dict["review_text"] for review_dict in reviews_list]
+    probabilities, stages = score_stages(texts, threshold, model_tier)
 
-    # Predict labels and probabilities
-    predictions = loaded_model.predict(test_data)
-    probabilities = loaded_model.predict_proba(test_data)
+    return flag_duplicates(format_results(reviews_list, probabilities, threshold, stages), texts)
 
-    results = []
-    
-    for i in range(len(predictions)):
-        datum = {
-            "review_text": reviews_list[i]["review_title"] +  " : " +  reviews_list[i]["review_text"],
-            "confidence": round(probabilities[i, 0] * 100),  # Confidence percentage
-            "label": bool(probabilities[i, 0] < threshold),  # True if original, else generated
-            "rating": reviews_list[i]["rating"]
-        }
-        results.append(datum)
-    
-    return results
+async def detect_fake_reviews_async(reviews_list, threshold=0.70, model_tier=None):
+    """
+    Same as detect_fake_reviews, but scored through the inference worker so the event loop stays free.
+    """
+    texts = [review_dict["review_title"] + " " + review_dict["review_text"] for review_dict in reviews_list]
+    probabilities, stages = await score_stages_async(texts, threshold, model_tier)
+
+    return await asyncio.to_thread(flag_duplicates, format_results(reviews_list, probabilities, threshold, stages), texts)
@@ -0,0 +1,165 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from ..config import settings
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference queue is at capacity and can't take more work."""
+
+
+class InferenceWorker:
+    """
+    Dynamic micro-batching worker that keeps model scoring off the event loop.
+
+    Concurrent callers submit lists of texts. The worker collects them for a few
+    milliseconds (or until the batch is full), scores everything as one matrix in
+    a thread or process pool, and resolves each caller's future with its slice of
+    the probabilities. While all pool slots are busy, new requests keep queueing,
+    so batches grow with load instead of latency.
+    """
+
+    def __init__(self, score_fn, max_wait_ms=None, max_batch_size=None, queue_size=None, pool=None, pool_workers=None):
+        """
+        Args:
+            score_fn (callable): Maps a list of texts to a sequence of fake probabilities.
+                Must be a module level function when a process pool is used.
+            max_wait_ms (float): How long to wait for more requests before scoring a batch.
+            max_batch_size (int): Number of texts that closes a batch early.
+            queue_size (int): Pending requests allowed before submissions are rejected.
+            pool (str): "thread" or "process".
+            pool_workers (int): Number of batches that may be scored at the same time.
+        """
+        self.score_fn = score_fn
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.inference_batch_wait_ms) / 1000
+        self.max_batch_size = max_batch_size or settings.inference_max_batch_size
+        self.queue_size = queue_size or settings.inference_queue_size
+        self.pool = pool or settings.inference_pool
+        self.pool_workers = pool_workers or settings.inference_pool_workers
+
+        self._queue = None
+        self._slots = None
+        self._executor = None
+        self._task = None
+        self._batches = set()  # Batches being scored, awaited on stop
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Create the queue and pool and start collecting batches on the running loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._slots = asyncio.Semaphore(self.pool_workers)
+        if self.pool == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.pool_workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_workers, thread_name_prefix="inference")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop batching, finish the batches being scored, fail anything still queued and shut the pool down."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        await asyncio.gather(*self._batches, return_exceptions=True)
+        stopped = RuntimeError("Inference worker stopped.")
+        while not self._queue.empty():
+            _fail(self._queue.get_nowait(), stopped)
+
+        # Off the loop, a process pool can take a while to join its workers
+        await asyncio.to_thread(self._executor.shutdown, wait=True)
+        self._executor = None
+
+    async def score(self, texts):
+        """
+        Score texts as part of the next micro-batch.
+
+        Args:
+            texts (list): Raw review strings.
+
+        Returns:
+            list: Fake probabilities, one per text, in input order.
+        """
+        if not texts:
+            return []
+        if not self.running:
+            # Worker not started (scripts, tests): score inline in a thread
+            return list(await asyncio.to_thread(self.score_fn, texts))
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((texts, future))
+        except asyncio.QueueFull:
+            raise InferenceQueueFull("Too many reviews waiting to be scored, try again shortly.")
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Only collect a new batch when a pool slot is free, so requests that
+            # arrive while scoring is busy are merged into the next batch
+            await self._slots.acquire()
+            try:
+                batch = await self._collect(loop)
+            except BaseException:
+                self._slots.release()
+                raise
+            task = asyncio.create_task(self._score_batch(loop, batch))
+            # The loop only keeps weak references to tasks
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _collect(self, loop):
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+
+        try:
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+        except asyncio.CancelledError:
+            # Stopped mid-collection, these requests are off the queue so stop() won't see them
+            stopped = RuntimeError("Inference worker stopped.")
+            for item in batch:
+                _fail(item, stopped)
+            raise
+
+        return batch
+
+    async def _score_batch(self, loop, batch):
+        texts = [text for item_texts, _ in batch for text in item_texts]
+        try:
+            probabilities = await loop.run_in_executor(self._executor, self.score_fn, texts)
+        except Exception as e:
+            for item in batch:
+                _fail(item, e)
+        else:
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(list(probabilities[offset:offset + len(item_texts)]))
+                offset += len(item_texts)
+        finally:
+            self._slots.release()
+
+
+def _fail(item, error):
+    _, future = item
+    if not future.done():
+        future.set_exception(error)
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import time
+import uuid
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from ..config import settings
+from .scraper import extract_reviews
+from .fake_review_classifier import detect_fake_reviews_async
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when too many analysis jobs are waiting and a new one can't be queued."""
+
+
+class NoReviewsFound(Exception):
+    """Raised by an analysis when the URL has no reviews to classify."""
+
+
+def normalize_url(url):
+    """
+    Canonical form of a URL for de-duplication.
+
+    Scheme and host are lowercased, default ports, fragments and trailing slashes
+    are dropped, and query parameters are sorted, so links that load the same page
+    map to the same key.
+    """
+    parts = urlsplit(str(url).strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class SingleFlight:
+    """Runs one coroutine per key at a time. Callers arriving while it runs share its result."""
+
+    def __init__(self):
+        self._in_flight = {}
+
+    async def run(self, key, coro_fn, *args, **kwargs):
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(coro_fn(*args, **kwargs))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield: one caller going away must not cancel the work for the others
+        return await asyncio.shield(future)
+
+
+# Concurrent jobs for the same page set crawl it once, whatever threshold or model they score with
+_scrapes = SingleFlight()
+
+
+class Job:
+    def __init__(self, key, params):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = "queued"  # queued -> running -> done | failed
+        self.result = None
+        self.error = None
+        self.submissions = 1
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def to_dict(self):
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "url": self.params["url"],
+            "submissions": self.submissions,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "done":
+            job["result"] = self.result
+        elif self.status == "failed":
+            job["error"] = self.error
+        return job
+
+
+async def run_analysis(url, page_limit=1, threshold=0.70, model_tier=None, force_refresh=False):
+    """Scrape and classify a URL, the same work as a synchronous /analyze-reviews call."""
+    scrape_key = (normalize_url(url), page_limit, force_refresh)
+    reviews = await _scrapes.run(scrape_key, extract_reviews, url, page_limit=page_limit, force_refresh=force_refresh)
+    if not reviews:
+        raise NoReviewsFound("No reviews found.")
+    analyzed_reviews = await detect_fake_reviews_async(reviews, threshold=threshold, model_tier=model_tier)
+    return {"analyzed_reviews": analyzed_reviews}
+
+
+class JobManager:
+    """
+    Background URL analysis with single-flight submissions.
+
+    Jobs are queued and run by a fixed number of worker tasks, which bounds how
+    many analyses (and so browsers and LLM calls) run at once. Submitting a URL
+    that already has a queued or running job with the same parameters attaches
+    to that job instead of starting a new one. Finished jobs are kept for
+    job_ttl seconds so their results can be fetched.
+    """
+
+    def __init__(self, run_fn, workers=None, queue_size=None, ttl=None):
+        self.run_fn = run_fn
+        self.workers = workers or settings.job_workers
+        self.queue_size = queue_size or settings.job_queue_size
+        self.ttl = settings.job_ttl if ttl is None else ttl
+
+        self._jobs = {}
+        self._in_flight = {}  # key -> job that is queued or running
+        self._queue = None
+        self._tasks = []
+        self._detached = set()
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers. Jobs still queued or running are marked failed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in list(self._in_flight.values()):
+            self._finish(job, error="Server shutting down.")
+
+    def submit(self, url, page_limit=1, threshold=0.70, model_tier=None, force_refresh=False):
+        """
+        Queue an analysis of url, or attach to the in-flight one for the same parameters.
+
+        Returns:
+            tuple: (job, attached), attached is True when an existing job was reused.
+        """
+        self._expire()
+        model_tier = model_tier or settings.default_model_tier
+        # force_refresh is part of the key, a refresh must not be answered from a job reading the cache
+        key = (normalize_url(url), page_limit, threshold, model_tier, force_refresh)
+
+        job = self._in_flight.get(key)
+        if job is not None:
+            job.submissions += 1
+            return job, True
+
+        job = Job(key, {
+            "url": str(url),
+            "page_limit": page_limit,
+            "threshold": threshold,
+            "model_tier": model_tier,
+            "force_refresh": force_refresh,
+        })
+        if self.running:
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                raise JobQueueFull("Too many analyses queued, try again shortly.")
+        else:
+            # Not started (scripts, tests): run it as a plain task
+            task = asyncio.get_running_loop().create_task(self._run(job))
+            self._detached.add(task)
+            task.add_done_callback(self._detached.discard)
+        self._jobs[job.id] = job
+        self._in_flight[key] = job
+        return job, False
+
+    def get(self, job_id):
+        self._expire()
+        return self._jobs.get(job_id)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            if job.finished:
+                continue
+            await self._run(job)
+
+    async def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            result = await self.run_fn(**job.params)
+        except asyncio.CancelledError:
+            self._finish(job, error="Job cancelled.")
+            raise
+        except NoReviewsFound as e:
+            self._finish(job, error=str(e))
+        except Exception as e:
+            logger.exception("Error running analysis job %s: %s", job.id, e)
+            self._finish(job, error=f"Error processing reviews: {e}")
+        else:
+            self._finish(job, result=result)
+
+    def _finish(self, job, result=None, error=None):
+        job.status = "failed" if error is not None else "done"
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        if self._in_flight.get(job.key) is job:
+            del self._in_flight[job.key]
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+analysis_jobs = JobManager(run_analysis)
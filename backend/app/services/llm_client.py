@@ -0,0 +1,189 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from ..config import settings
+from .page_pruner import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Shared client for LLM review extraction. One process wide AsyncOpenAI client keeps its HTTP
+# connections open between calls, token buckets hold requests and tokens per minute under the
+# account's limits, a semaphore caps the calls in flight, and rate limited or failed calls are
+# retried with jittered exponential backoff. settings.llm_base_url points it at any OpenAI
+# compatible endpoint, such as benchmarks/llm_stub.py.
+
+EXTRACTION_INSTRUCTION = """From the crawled content, extract all reviews. The rating is supposed to be return as a fraction like 4/5 or 7/10 depending on the website.
+Answer with a JSON object {"reviews": [...]}, where each extracted review is in JSON format as follows:
+{"review_title": "Title", "review_text": "Full review text", "rating": "Rating"}"""
+
+
+class LLMRateLimited(Exception):
+    """The LLM endpoint kept rate limiting a call after every retry."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled at rate_per_minute, holding at most one minute's worth.
+
+    Waiters are served in arrival order, so a large request isn't starved by small ones.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount=1):
+        # More than the capacity could never be granted, so it waits for a full bucket instead
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self._tokens < amount:
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= amount
+
+    def refund(self, amount):
+        """Return tokens reserved for a call that used fewer, or failed."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class LLMClient:
+    def __init__(self, base_url=None, api_key=None, model=None, max_concurrency=None,
+                 requests_per_minute=None, tokens_per_minute=None, max_retries=None, timeout=None):
+        self.base_url = base_url if base_url is not None else settings.llm_base_url
+        self.api_key = api_key if api_key is not None else settings.openai_api_key
+        self.model = model or settings.llm_model
+        self.max_concurrency = max_concurrency or settings.llm_max_concurrency
+        self.max_retries = settings.llm_max_retries if max_retries is None else max_retries
+        self.timeout = timeout or settings.llm_timeout
+        self.requests = TokenBucket(requests_per_minute or settings.llm_requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute or settings.llm_tokens_per_minute)
+
+        self._client = None
+        self._semaphore = None
+
+    @property
+    def client(self):
+        # Created on first use, inside the event loop that will drive it
+        if self._client is None:
+            import httpx
+            import openai
+
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key or "unused",  # Local stubs don't check it
+                base_url=self.base_url or None,
+                max_retries=0,  # Retries are ours, so they share the rate limiters
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+                    timeout=self.timeout,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def _backoff(self, attempt, retry_after=None):
+        # Full jitter, so clients that were limited together don't retry together
+        delay = random.uniform(0, min(settings.llm_backoff_max, settings.llm_backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0)
+
+    async def complete(self, messages, max_tokens=None):
+        """
+        One chat completion, within the rate limits and retried on transient errors.
+
+        Returns:
+            str: The message content of the first choice.
+
+        Raises:
+            LLMRateLimited: The endpoint still rate limited the call after max_retries retries.
+        """
+        import openai
+
+        client = self.client
+        max_tokens = max_tokens or settings.llm_max_output_tokens
+        # Providers count the completion budget against the token limit up front
+        reserved = sum(estimate_tokens(message["content"]) for message in messages) + max_tokens
+
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire()
+            await self.tokens.acquire(reserved)
+            retry_after = None
+            # A call that failed, for whatever reason, used none of its reservation; retries reserve it again
+            used = 0
+            try:
+                async with self._semaphore:
+                    response = await client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=0,
+                        response_format={"type": "json_object"},
+                    )
+                # Without usage the call is assumed to have spent its whole reservation
+                used = reserved if response.usage is None else response.usage.total_tokens
+                return response.choices[0].message.content or ""
+            except openai.RateLimitError as e:
+                retry_after = _retry_after(e)
+                if attempt == self.max_retries:
+                    raise LLMRateLimited(f"LLM rate limited after {attempt + 1} attempts: {e}", retry_after) from e
+                error = e
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                # APITimeoutError is an APIConnectionError
+                if attempt == self.max_retries:
+                    raise
+                error = e
+            finally:
+                self.tokens.refund(max(0, reserved - used))
+            delay = self._backoff(attempt, retry_after)
+            logger.warning("LLM call failed (%s), retry %d/%d in %.1fs", error, attempt + 1, self.max_retries, delay)
+            await asyncio.sleep(delay)
+
+    async def extract_reviews(self, url, content):
+        """
+        Extract review dicts from one pruned page chunk.
+
+        Returns:
+            list: Raw review dicts, still to be validated. Empty if the answer wasn't usable JSON.
+        """
+        answer = await self.complete([
+            {"role": "system", "content": EXTRACTION_INSTRUCTION},
+            {"role": "user", "content": f"URL: {url}\n\n{content}"},
+        ])
+        try:
+            parsed = json.loads(answer)
+        except json.JSONDecodeError:
+            logger.warning("LLM answer for %s was not JSON", url)
+            return []
+        reviews = parsed.get("reviews", []) if isinstance(parsed, dict) else parsed
+        return reviews if isinstance(reviews, list) else []
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+llm_client = LLMClient()
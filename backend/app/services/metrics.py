@@ -0,0 +1,110 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process counters and histograms, rendered in the Prometheus text format at /metrics.
+# Metrics are per process: each uvicorn worker (and each inference pool process, when
+# settings.inference_pool is "process") keeps its own.
+
+# Seconds, from a cached prediction to a slow multi-page LLM extraction
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = [*zip(labelnames, key), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.extend(self._samples(key, value))
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self, key, value):
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self, key, state):
+        counts, total, count = state
+        cumulative = 0
+        for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += bucket_count
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}"
+        yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+def render_metrics():
+    """Every registered metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# Stages: crawl, structured_extraction, pruning, llm_extraction, validation, preprocessing, vectorization, scoring, deduplication
+STAGE_SECONDS = Histogram("review_radar_stage_seconds", "Time spent per pipeline stage.", ["stage"])
+REQUEST_SECONDS = Histogram("review_radar_http_request_seconds", "HTTP request latency.", ["method", "route", "status"])
+REVIEWS_SCORED = Counter("review_radar_reviews_scored_total", "Reviews scored, cached or not.", ["model"])
+REVIEWS_SCRAPED = Counter("review_radar_reviews_scraped_total", "Reviews extracted from crawled pages.", ["method"])
+CASCADE_DECISIONS = Counter("review_radar_cascade_decisions_total", "Cascaded reviews by the tier that decided them.", ["stage"])
+CACHE_LOOKUPS = Counter("review_radar_cache_lookups_total", "Cache lookups by cache and result.", ["cache", "result"])
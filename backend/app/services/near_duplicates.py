@@ -0,0 +1,171 @@
+import string
+import zlib
+import numpy as np
+from ..config import settings
+
+# Near duplicate detection across the reviews of one page or product.
+#
+# Each review becomes a set of word shingles, summarized by a MinHash signature whose agreement
+# with another review's estimates their Jaccard similarity. LSH splits the signatures into bands,
+# and only reviews that share a band bucket are compared, so the work grows linearly with the
+# number of reviews instead of with every pair. Matches are merged into clusters with union-find.
+
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band, pairs around 0.5 Jaccard similarity or more become candidates
+# Hashes are permuted as (a * x + b) mod a prime just above 2^32
+_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(2 ** 64 - 1)
+# Shingles hashed per step, bounds the (shingles x NUM_PERM) scratch array to 16 MB
+_CHUNK_SIZE = 2 ** 15
+
+# Case and punctuation are ignored, stopwords are kept since they are part of the phrasing
+_PUNCTUATION_TABLE = str.maketrans(string.punctuation, " " * len(string.punctuation))
+
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 2 ** 63, size=NUM_PERM // BANDS, dtype=np.uint64) | np.uint64(1)
+
+
+def shingle_hashes(documents, shingle_size):
+    """
+    32 bit hashes of every word shingle of the lowercased, punctuation free documents,
+    grouped by document.
+
+    Documents shorter than shingle_size contribute their single words instead.
+
+    Returns:
+        tuple: (hashes, document index of each hash), both sorted by document.
+    """
+    tokens_per_document = [document.lower().translate(_PUNCTUATION_TABLE).split() for document in documents]
+    lengths = np.fromiter(map(len, tokens_per_document), dtype=np.int64, count=len(documents))
+    tokens = [token for document_tokens in tokens_per_document for token in document_tokens]
+    if not tokens:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+
+    # Hash each distinct word once, then combine words into shingle hashes with array arithmetic
+    token_ids = {}
+    ids = np.fromiter((token_ids.setdefault(token, len(token_ids)) for token in tokens), dtype=np.int64, count=len(tokens))
+    token_hashes = np.fromiter((zlib.crc32(token.encode()) for token in token_ids), dtype=np.uint64, count=len(token_ids))[ids]
+    token_documents = np.repeat(np.arange(len(documents)), lengths)
+
+    hashes, hash_documents = [], []
+    count = len(token_hashes) - shingle_size + 1
+    if count > 0:
+        starts = np.arange(count)
+        # Shingles may not span two documents
+        valid = token_documents[starts] == token_documents[starts + shingle_size - 1]
+        combined = np.zeros(count, dtype=np.uint64)
+        for offset in range(shingle_size):
+            combined = combined * np.uint64(1000003) + token_hashes[offset:offset + count]  # Wraps mod 2^64
+        hashes.append(combined[valid])
+        hash_documents.append(token_documents[starts[valid]])
+    short = lengths[token_documents] < shingle_size
+    hashes.append(token_hashes[short])
+    hash_documents.append(token_documents[short])
+
+    hashes, hash_documents = np.concatenate(hashes), np.concatenate(hash_documents)
+    order = np.argsort(hash_documents, kind="stable")
+    hashes = hashes[order]
+    # Fold to 32 bits so the permutation products below can't overflow
+    return (hashes ^ (hashes >> np.uint64(32))) & np.uint64(0xFFFFFFFF), hash_documents[order]
+
+
+def minhash_signatures(documents, shingle_size=3):
+    """
+    One NUM_PERM long MinHash signature per document.
+
+    Documents without any words get the all maximum signature and should not be indexed.
+    """
+    hashes, hash_documents = shingle_hashes(documents, shingle_size)
+    signatures = np.full((len(documents), NUM_PERM), _MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(hashes), _CHUNK_SIZE):
+        chunk = hashes[start:start + _CHUNK_SIZE]
+        chunk_documents = hash_documents[start:start + _CHUNK_SIZE]
+        permuted = (chunk[:, None] * _PERM_A + _PERM_B) % _PRIME
+        # Hashes are sorted by document, so every document is one run within the chunk
+        run_starts = np.flatnonzero(np.r_[True, chunk_documents[1:] != chunk_documents[:-1]])
+        run_documents = chunk_documents[run_starts]
+        # A document can continue from the previous chunk, so merge with what is there
+        signatures[run_documents] = np.minimum(signatures[run_documents], np.minimum.reduceat(permuted, run_starts, axis=0))
+    return signatures
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_near_duplicates(texts, threshold=None, shingle_size=None):
+    """
+    Cluster reviews whose wording is nearly the same.
+
+    Args:
+        texts (list): Raw review strings.
+        threshold (float): Estimated Jaccard similarity of shingle sets from which two
+            reviews count as near duplicates, defaults to settings.duplicate_threshold.
+        shingle_size (int): Words per shingle, defaults to settings.duplicate_shingle_size.
+
+    Returns:
+        tuple: (cluster_ids, scores). cluster_ids holds a cluster number shared by the
+            members of each near duplicate group, numbered from 0 in order of appearance,
+            or None for reviews without duplicates. scores holds each review's highest
+            estimated similarity to another review in its cluster, 0.0 when it has none.
+    """
+    threshold = settings.duplicate_threshold if threshold is None else threshold
+    shingle_size = shingle_size or settings.duplicate_shingle_size
+    count = len(texts)
+    if count < 2:
+        return [None] * count, [0.0] * count
+
+    signatures = minhash_signatures(texts, shingle_size)
+    indexed = np.flatnonzero(signatures[:, 0] != _MAX_HASH)
+    parent = list(range(count))
+    scores = np.zeros(count)
+
+    rows = NUM_PERM // BANDS
+    for band in range(BANDS):
+        # One 64 bit key per signature band, equal bands land in the same bucket
+        keys = (signatures[indexed, band * rows:(band + 1) * rows] * _BAND_MIX).sum(axis=1)
+        order = indexed[np.argsort(keys, kind="stable")]
+        sorted_keys = np.sort(keys, kind="stable")
+        same_bucket = np.flatnonzero(sorted_keys[1:] == sorted_keys[:-1]) + 1
+        if not len(same_bucket):
+            continue
+        # Compare each review with the first one in its bucket, which keeps a bucket of
+        # n identical reviews at n comparisons
+        bucket_starts = np.r_[0, np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1]
+        leaders = order[bucket_starts[np.searchsorted(bucket_starts, same_bucket, side="right") - 1]]
+        members = order[same_bucket]
+        similarity = (signatures[leaders] == signatures[members]).mean(axis=1)
+        matched = similarity >= threshold
+        np.maximum.at(scores, members[matched], similarity[matched])
+        np.maximum.at(scores, leaders[matched], similarity[matched])
+        for leader, member in zip(leaders[matched].tolist(), members[matched].tolist()):
+            root_leader, root_member = _find(parent, leader), _find(parent, member)
+            if root_leader != root_member:
+                parent[max(root_leader, root_member)] = min(root_leader, root_member)
+
+    roots = [_find(parent, i) for i in range(count)]
+    sizes = {}
+    for root in roots:
+        sizes[root] = sizes.get(root, 0) + 1
+    cluster_numbers = {}
+    cluster_ids = []
+    for root in roots:
+        if sizes[root] < 2:
+            cluster_ids.append(None)
+        else:
+            cluster_ids.append(cluster_numbers.setdefault(root, len(cluster_numbers)))
+    return cluster_ids, [round(float(score), 3) for score in scores]
+
+
+def annotate_duplicates(results, texts):
+    """Add cluster_id and duplication_score to each formatted result, see find_near_duplicates."""
+    cluster_ids, scores = find_near_duplicates(texts)
+    for result, cluster_id, score in zip(results, cluster_ids, scores):
+        result["cluster_id"] = cluster_id
+        result["duplication_score"] = score
+    return results
@@ -0,0 +1,267 @@
+import asyncio
+import fcntl
+import logging
+import os
+import re
+import threading
+import time
+import numpy as np
+from ..config import settings
+from .preprocessing import preprocess_batch, text_process
+
+logger = logging.getLogger(__name__)
+
+# Online tier: a HashingVectorizer feeding an SGD logistic regression. Hashing needs no fitted
+# vocabulary, so reviewer confirmed labels can be applied with partial_fit as they arrive, and
+# words from a new spam campaign count from the first update on.
+#
+# Every update is published as a numbered snapshot in <model>.snapshots/ and then hard linked
+# over the served model path with os.replace, which ReviewClassifier hot swaps like any other
+# artifact. Snapshots are never modified, so rolling back is linking an older one.
+
+# Same label strings as the batch trained tiers, classes_[0] is the computer generated one
+CLASSES = np.array(["CG", "OR"])
+N_FEATURES = 2 ** 20
+
+_SNAPSHOT_PATTERN = re.compile(r"^v(\d+)\.joblib$")
+
+
+def build_online_pipeline():
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import Pipeline
+
+    return Pipeline([
+        # alternate_sign=False keeps the features non negative like the TF-IDF tiers
+        ('hashing', HashingVectorizer(analyzer=text_process, n_features=N_FEATURES, alternate_sign=False, norm='l2')),
+        ('classifier', SGDClassifier(loss='log_loss', alpha=1e-5, random_state=0)),
+    ])
+
+
+def partial_fit(pipeline, documents, labels, batch_size=None):
+    """
+    Apply labelled, preprocessed documents to the pipeline in mini-batches.
+
+    Args:
+        pipeline (sklearn.pipeline.Pipeline): From build_online_pipeline.
+        documents (list): Reviews normalized by preprocess_batch.
+        labels (list): "CG" or "OR" per document.
+        batch_size (int): Documents per partial_fit call, defaults to settings.online_batch_size.
+    """
+    batch_size = batch_size or settings.online_batch_size
+    vectorizer = pipeline.named_steps['hashing']
+    classifier = pipeline.named_steps['classifier']
+    for start in range(0, len(documents), batch_size):
+        features = vectorizer.transform(documents[start:start + batch_size])
+        classifier.partial_fit(features, labels[start:start + batch_size], classes=CLASSES)
+
+
+def snapshot_dir(model_path):
+    return os.path.splitext(model_path)[0] + ".snapshots"
+
+
+def snapshot_versions(model_path):
+    """Published snapshot versions for model_path, oldest first."""
+    try:
+        names = os.listdir(snapshot_dir(model_path))
+    except FileNotFoundError:
+        return []
+    return sorted(int(match.group(1)) for match in map(_SNAPSHOT_PATTERN.match, names) if match)
+
+
+def snapshot_path(model_path, version):
+    return os.path.join(snapshot_dir(model_path), f"v{version:06d}.joblib")
+
+
+def activate_snapshot(model_path, version):
+    """Serve snapshot version from model_path, swapping it in with a single os.replace."""
+    source = snapshot_path(model_path, version)
+    tmp_path = f"{model_path}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        # Filesystems without hard links get a copy
+        import shutil
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, model_path)
+
+
+def publish_snapshot(pipeline, model_path, keep=None):
+    """
+    Write pipeline as the next numbered snapshot and serve it from model_path.
+
+    Args:
+        pipeline (sklearn.pipeline.Pipeline): The updated online pipeline.
+        model_path (str): Served artifact, settings.fake_review_online_model_path.
+        keep (int): Newest snapshots to keep, defaults to settings.online_snapshots_kept.
+            0 keeps every snapshot.
+
+    Returns:
+        int: The published version.
+    """
+    import joblib
+
+    keep = settings.online_snapshots_kept if keep is None else keep
+    versions = snapshot_versions(model_path)
+    version = versions[-1] + 1 if versions else 1
+    path = snapshot_path(model_path, version)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(pipeline, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    activate_snapshot(model_path, version)
+
+    for old_version in (versions + [version])[:-keep] if keep > 0 else []:
+        os.remove(snapshot_path(model_path, old_version))
+    logger.info("Published online model snapshot v%d to %s", version, model_path)
+    return version
+
+
+class OnlineLearner:
+    """
+    Applies labelled feedback to the online model and publishes the result.
+
+    Every update starts from the currently served artifact, under a file lock
+    next to it, so workers and the CLI sharing a model path apply their updates
+    one after another instead of overwriting each other's.
+    """
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self._lock = threading.Lock()
+
+    def _load_served(self):
+        import joblib
+
+        if os.path.exists(self.model_path):
+            # Not memory mapped, partial_fit updates the coefficients in place
+            return joblib.load(self.model_path)
+        logger.warning("No online model at %s, starting from an untrained one", self.model_path)
+        return build_online_pipeline()
+
+    def update(self, texts, labels):
+        """
+        Apply reviewer confirmed labels and publish a new snapshot.
+
+        Args:
+            texts (list): Raw review strings.
+            labels (list): "CG" (computer generated) or "OR" (original) per review.
+
+        Returns:
+            dict: The published version and the number of reviews applied.
+        """
+        documents = preprocess_batch(texts)
+        lock_path = self.model_path + ".lock"
+        os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+        with self._lock, open(lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                pipeline = self._load_served()
+                partial_fit(pipeline, documents, list(labels))
+                version = publish_snapshot(pipeline, self.model_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return {"version": version, "applied": len(documents)}
+
+
+class FeedbackBuffer:
+    """
+    Collects labelled feedback from the API and applies it to the online model in batches.
+
+    Every update publishes a full snapshot that all workers reload, so single reviews are
+    held back until min_batch of them are waiting, or flush_interval seconds after the
+    oldest arrived. Buffered labels live in this process only and are applied when the
+    app shuts down; a crash loses them.
+    """
+
+    def __init__(self, learner, min_batch=None, flush_interval=None, on_publish=None):
+        self.learner = learner
+        self.min_batch = min_batch or settings.feedback_min_batch
+        self.flush_interval = settings.feedback_flush_interval if flush_interval is None else flush_interval
+        self.on_publish = on_publish  # Called with the published version, off the event loop
+
+        self._texts = []
+        self._labels = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._task = None
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, texts, labels):
+        """
+        Buffer labelled reviews.
+
+        Returns:
+            bool: True when min_batch reviews are waiting and the buffer should be flushed.
+        """
+        with self._lock:
+            if not self._texts:
+                self._oldest = time.monotonic()
+            self._texts.extend(texts)
+            self._labels.extend(labels)
+            return len(self._texts) >= self.min_batch
+
+    def flush(self):
+        """
+        Apply everything buffered as one update. Blocking, run it in a thread.
+
+        Returns:
+            dict: The learner's result, or None when nothing was buffered.
+        """
+        with self._lock:
+            texts, labels, oldest = self._texts, self._labels, self._oldest
+            self._texts, self._labels, self._oldest = [], [], None
+        if not texts:
+            return None
+        try:
+            result = self.learner.update(texts, labels)
+        except Exception:
+            # Keep the labels for the next flush rather than dropping them
+            with self._lock:
+                self._texts[:0], self._labels[:0] = texts, labels
+                self._oldest = oldest
+            raise
+        logger.info("Applied %d feedback labels, online model snapshot v%d", result["applied"], result["version"])
+        if self.on_publish is not None:
+            self.on_publish(result["version"])
+        return result
+
+    def due(self):
+        oldest = self._oldest
+        return oldest is not None and time.monotonic() - oldest >= self.flush_interval
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush timer and apply whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(min(self.flush_interval, 5.0) or 5.0)
+            if self.due():
+                try:
+                    await asyncio.to_thread(self.flush)
+                except Exception as e:
+                    logger.exception("Error applying buffered feedback: %s", e)
+
+
+def _reload_online_tier(version):
+    from .review_classifier import classifiers
+
+    # Other workers pick the snapshot up at their next reload check, this one right away
+    classifiers["online"].reload_if_changed()
+
+
+online_learner = OnlineLearner(settings.fake_review_online_model_path)
+# Started and stopped by the app lifespan
+feedback_buffer = FeedbackBuffer(online_learner, on_publish=_reload_online_tier)
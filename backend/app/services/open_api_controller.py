@@ -1,56 +1,92 @@
-import joblib
-import string
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import nltk
-
-# Ensure NLTK stopwords are downloaded
-nltk.download('stopwords')
-nltk.download('punkt')
-stop_words = set(stopwords.words('english'))
-
-# Load the pre-trained model
-loaded_model = joblib.load('./models/fake_review_model.joblib')
-
-
-def preprocess_reviews(reviews_list):
-    processed_reviews = []
-    
-    for review_dict in reviews_list:
-        # Remove punctuation and stop words
-        tokens = word_tokenize(review_dict["review_text"])
-        filtered_tokens = [word.lower() for word in tokens if word.lower() not in stop_words and word not in string.punctuation]
-        processed_reviews.append(" ".join(filtered_tokens))
-    
-    return processed_reviews
-
-def api_check_fake_reviews(reviews_list, threshold=0.70):
+import asyncio
+from .review_classifier import score_stages, score_stages_async
+
+# Strictness levels exposed by the open API
+THRESHOLD_MAP = {
+    "high": 0.9,
+    "medium": 0.75,
+    "low": 0.65
+}
+
+# Reviews scored per predict_proba call in batch mode, caps the kernel matrix size
+BATCH_CHUNK_SIZE = 1000
+
+
+def format_api_results(reviews_list, probabilities, threshold, stages):
+    return [{
+        "review_text": review_dict["review_text"],
+        "confidence": round(probability * 100),  # Confidence percentage
+        "label": bool(probability < threshold),  # True if original, else generated
+        "stage": stage,  # Model tier that decided the label
+    } for review_dict, probability, stage in zip(reviews_list, probabilities, stages)]
+
+def format_api_batch_results(chunks, chunk_scores):
+    results = {}
+
+    for chunk, (probabilities, stages) in zip(chunks, chunk_scores):
+        for review_dict, probability, stage in zip(chunk, probabilities, stages):
+            results[review_dict["id"]] = {
+                "review_text": review_dict["review_text"],
+                "confidence": round(probability * 100),  # Confidence percentage
+                "label": bool(probability < review_dict["threshold"]),  # True if original, else generated
+                "stage": stage,  # Model tier that decided the label
+            }
+
+    return results
+
+def api_check_fake_reviews(reviews_list, threshold=0.70, model_tier=None):
     """
     Detect fake reviews from a list of reviews.
 
     Args:
         reviews_list (list): A list of dictionaries containing review titles and texts.
         threshold (float): Confidence threshold for labeling a review as fake.
+        model_tier (str): "accurate", "fast" or "online", defaults to settings.default_model_tier.
 
     Returns:
         list: A list of dictionaries containing review text, confidence, label, and rating.
     """
-    # Preprocess reviews
-    test_data = preprocess_reviews(reviews_list)
-    print("test data: : ",test_data)
-    # Predict labels and probabilities
-    predictions = loaded_model.predict(test_data)
-    probabilities = loaded_model.predict_proba(test_data)
-    print("pred",predictions, probabilities)
-    results = []
-    
-    for i in range(len(predictions)):
-        datum = {
-            "review_text":  reviews_list[i]["review_text"],
-            "confidence": round(probabilities[i, 0] * 100),  # Confidence percentage
-            "label": bool(probabilities[i, 0] < threshold),  # True if original, else generated
-        }
-        results.append(datum)
-    print("results")
-    return results
+    test_data = [review_dict["review_text"] for review_dict in reviews_list]
+    # Labels and confidences both come from one probability pass
+    probabilities, stages = score_stages(test_data, threshold, model_tier)
+    return format_api_results(reviews_list, probabilities, threshold, stages)
+
+def api_check_fake_reviews_batch(reviews_list, chunk_size=BATCH_CHUNK_SIZE, model_tier=None):
+    """
+    Detect fake reviews for a large batch in chunked, vectorized passes.
+
+    Args:
+        reviews_list (list): A list of dictionaries with an id, review text and threshold.
+        chunk_size (int): Number of reviews scored per predict_proba call.
+        model_tier (str): "accurate", "fast" or "online", defaults to settings.default_model_tier.
+
+    Returns:
+        dict: Results keyed by review id, each with review text, confidence and label.
+    """
+    chunks = [reviews_list[start:start + chunk_size] for start in range(0, len(reviews_list), chunk_size)]
+    chunk_scores = [
+        score_stages([review_dict["review_text"] for review_dict in chunk], [review_dict["threshold"] for review_dict in chunk], model_tier)
+        for chunk in chunks
+    ]
+
+    return format_api_batch_results(chunks, chunk_scores)
+
+async def api_check_fake_reviews_async(reviews_list, threshold=0.70, model_tier=None):
+    """
+    Same as api_check_fake_reviews, but scored through the shared inference worker.
+    """
+    probabilities, stages = await score_stages_async([review_dict["review_text"] for review_dict in reviews_list], threshold, model_tier)
+
+    return format_api_results(reviews_list, probabilities, threshold, stages)
+
+async def api_check_fake_reviews_batch_async(reviews_list, chunk_size=BATCH_CHUNK_SIZE, model_tier=None):
+    """
+    Same as api_check_fake_reviews_batch, but each chunk is submitted to the inference worker.
+    """
+    chunks = [reviews_list[start:start + chunk_size] for start in range(0, len(reviews_list), chunk_size)]
+    chunk_scores = await asyncio.gather(*[
+        score_stages_async([review_dict["review_text"] for review_dict in chunk], [review_dict["threshold"] for review_dict in chunk], model_tier)
+        for chunk in chunks
+    ])
 
+    return format_api_batch_results(chunks, chunk_scores)
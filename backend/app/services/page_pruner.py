@@ -0,0 +1,129 @@
+import re
+from collections import defaultdict
+
+# Prunes a crawled page down to the region that holds its reviews before it goes to the LLM.
+# Review lists are repeated sibling elements (one per review) with a lot of plain text and
+# ratings in them, while navigation, ads and footers are short, link heavy or unrepeated.
+
+# Never hold reviews, dropped before anything is measured
+_BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "nav", "header", "footer", "aside", "form", "button", "select"]
+_RATING_RE = re.compile(r"\d(?:[.,]\d)?\s*(?:/|out of)\s*(?:5|10)\b|★|\bstars?\b|\brated\b", re.I)
+
+MIN_REPEATS = 2  # Sibling elements needed before a group counts as a list
+MIN_BLOCK_WORDS = 5  # Shorter blocks are labels, buttons or links, not reviews
+RATING_BONUS_WORDS = 20  # A rating in a block is worth this many words of plain text
+
+
+def estimate_tokens(text):
+    # Same words to tokens rate crawl4ai uses to size its chunks
+    return int(len(text.split()) * 1.3) + 1
+
+
+def _signature(element):
+    return element.name, tuple(sorted(element.get("class") or ()))
+
+
+def _block_text(element):
+    return " ".join(element.get_text(" ", strip=True).split())
+
+
+def _link_density(element, text):
+    link_chars = sum(len(link.get_text(" ", strip=True)) for link in element.find_all("a"))
+    return min(1.0, link_chars / max(len(text), 1))
+
+
+def _score_group(elements):
+    """Score a group of same-shaped siblings, returning (score, texts) for its blocks worth keeping."""
+    block_scores = []
+    texts = []
+    for element in elements:
+        text = _block_text(element)
+        words = len(text.split())
+        if words < MIN_BLOCK_WORDS:
+            continue
+        ratings = len(_RATING_RE.findall(text))
+        block_scores.append((words + RATING_BONUS_WORDS * min(ratings, 2)) * (1.0 - _link_density(element, text)))
+        texts.append(text)
+    total = sum(block_scores)
+    if len(texts) < MIN_REPEATS or total <= 0:
+        return 0.0, []
+    # Reviews are alike in size. Page wrappers, where one member holds most of the page, lose out
+    # to the list nested inside them.
+    return total * (1.0 - max(block_scores) / total), texts
+
+
+def find_review_blocks(html):
+    """
+    Find the text blocks of the page's review list.
+
+    Every element's children are grouped by tag and class. The group with the most
+    plain, non-link text, boosted by rating patterns, is taken as the review list
+    and each of its members becomes one block. Pages without a repeated group fall
+    back to the page text with boilerplate elements removed.
+
+    Args:
+        html (str): Raw page HTML.
+
+    Returns:
+        list: Text of each review-bearing block, in page order.
+    """
+    if not html:
+        return []
+
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
+    for element in soup(_BOILERPLATE_TAGS):
+        element.decompose()
+    body = soup.body or soup
+
+    best_score, best_texts = 0.0, []
+    for parent in [body, *body.find_all(True)]:
+        groups = defaultdict(list)
+        for child in parent.find_all(True, recursive=False):
+            groups[_signature(child)].append(child)
+        for elements in groups.values():
+            if len(elements) < MIN_REPEATS:
+                continue
+            score, texts = _score_group(elements)
+            if score > best_score:
+                best_score, best_texts = score, texts
+
+    if best_texts:
+        return best_texts
+
+    text = body.get_text("\n", strip=True)
+    return [text] if text else []
+
+
+def chunk_blocks(blocks, token_budget):
+    """
+    Pack blocks into as few chunks as fit token_budget, keeping their order.
+
+    Blocks are never split between chunks unless a single block is over budget
+    on its own, so a review reaches the LLM in one piece.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for block in blocks:
+        tokens = estimate_tokens(block)
+        if tokens > token_budget:
+            words = block.split()
+            step = max(1, int(token_budget / 1.3) - 1)
+            pieces = [" ".join(words[start:start + step]) for start in range(0, len(words), step)]
+        else:
+            pieces = [block]
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > token_budget:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def prune_page(html, token_budget):
+    """Return the page's review region split into chunks of at most token_budget tokens."""
+    return chunk_blocks(find_review_blocks(html), token_budget)
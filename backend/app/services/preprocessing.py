@@ -0,0 +1,81 @@
+import string
+from functools import lru_cache
+
+# NLTK's English stopword list, shipped with the package so it never has to be downloaded
+STOP_WORDS = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself
+yourselves he him his himself she she's her hers herself it it's its itself they them their
+theirs themselves what which who whom this that that'll these those am is are was were be
+been being have has had having do does did doing a an the and but if or because as until
+while of at by for with about against between into through during before after above below
+to from up down in out on off over under again further then once here there when where why
+how all any both each few more most other some such no nor not only own same so than too
+very s t can will just don don't should should've now d ll m o re ve y ain aren aren't
+couldn couldn't didn didn't doesn doesn't hadn hadn't hasn hasn't haven haven't isn isn't ma
+mightn mightn't mustn mustn't needn needn't shan shan't shouldn shouldn't wasn wasn't weren
+weren't won won't wouldn wouldn't
+""".split())
+
+# Deletes ASCII punctuation in a single C level pass
+_PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation)
+
+# Separates documents inside a batch, survives lower() and the punctuation table
+_DOCUMENT_SEPARATOR = "\x00"
+
+_stemmer = None
+
+
+def _get_stemmer():
+    # Importing nltk pulls in scipy and takes most of a second, so it waits for the first review
+    global _stemmer
+    if _stemmer is None:
+        from nltk.stem.porter import PorterStemmer
+        _stemmer = PorterStemmer()
+    return _stemmer
+
+
+@lru_cache(maxsize=100_000)
+def stem(token):
+    # Review vocabulary is heavily repeated, so most tokens hit the cache
+    return _get_stemmer().stem(token)
+
+
+def preprocess_batch(texts):
+    """
+    Normalize a batch of raw review strings into the form the models are trained on.
+
+    Lowercases, strips punctuation, drops stopwords and numbers, and Porter stems
+    every token. Lowercasing and punctuation removal run once over the whole batch.
+
+    Args:
+        texts (list): Raw review strings.
+
+    Returns:
+        list: One space separated string of stemmed tokens per input text.
+    """
+    if not texts:
+        return []
+
+    joined = _DOCUMENT_SEPARATOR.join(str(text).replace(_DOCUMENT_SEPARATOR, " ") for text in texts)
+    documents = joined.lower().translate(_PUNCTUATION_TABLE).split(_DOCUMENT_SEPARATOR)
+
+    stop_words = STOP_WORDS
+    return [
+        " ".join([stem(token) for token in document.split() if token not in stop_words and not token.isdigit()])
+        for document in documents
+    ]
+
+
+def preprocess_text(text):
+    """Normalize a single raw review string, see preprocess_batch."""
+    return preprocess_batch([text])[0]
+
+
+def text_process(review):
+    """
+    Analyzer for the CountVectorizer in the trained pipelines.
+
+    Reviews reach the pipeline already normalized by preprocess_batch, so
+    tokenizing is a plain whitespace split.
+    """
+    return review.split()
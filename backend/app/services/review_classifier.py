@@ -0,0 +1,321 @@
+import gc
+import logging
+import os
+import threading
+import time
+from functools import partial
+import numpy as np
+from ..config import settings
+from .inference_worker import InferenceWorker
+from .compact_model import CompactModel, META_FILE, check_parity
+from .preprocessing import preprocess_batch
+from .cache import PredictionCache, prediction_cache
+from .metrics import STAGE_SECONDS, REVIEWS_SCORED, CASCADE_DECISIONS
+
+logger = logging.getLogger(__name__)
+
+
+def vectorize(model, documents):
+    """Feature rows for preprocessed documents, from a pipeline or a CompactModel."""
+    if isinstance(model, CompactModel):
+        return model.transform(documents)
+    return model[:-1].transform(documents)
+
+
+def classify(model, features):
+    """Class probabilities for feature rows produced by vectorize."""
+    if isinstance(model, CompactModel):
+        return model.predict_proba_features(features)
+    return model[-1].predict_proba(features)
+
+
+class ReviewClassifier:
+    """
+    Process wide owner of the fake review model.
+
+    The model is loaded lazily on first use and reloaded when the artifact at
+    model_path changes on disk. A reload builds the new model completely before
+    swapping the reference, so in-flight predictions finish on the model they
+    started with. Uncompressed artifacts are memory mapped, which keeps their
+    arrays in the page cache instead of the heap while old and new overlap.
+
+    With settings.model_format "auto" or "compact", the compact export next to
+    model_path (see compact_model) is served instead of the pickled pipeline.
+    Its arrays are memory mapped read only, so all workers on a host share them.
+    A pickled pipeline is converted to the same NumPy scoring code at load time,
+    as settings.kernel_backend allows. That conversion copies the support vectors
+    to each worker's heap, see the kernel_backend setting.
+    """
+
+    def __init__(self, model_path, reload_interval=None, model_format=None, name=None, kernel_backend=None):
+        self.model_path = model_path
+        self.name = name or os.path.basename(model_path)
+        self.compact_path = os.path.splitext(model_path)[0] + ".compact"
+        self.model_format = model_format or settings.model_format
+        self.kernel_backend = kernel_backend or settings.kernel_backend
+        self.reload_interval = settings.model_reload_interval if reload_interval is None else reload_interval
+
+        # (model, version) swapped as one reference so readers never see a mismatched pair
+        self._current = None
+        self._artifact = None  # Version of the loaded artifact, to notice when it changes
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+
+    def current(self):
+        """Return the (model, version) pair to score with, loading or reloading as needed."""
+        if self._current is None:
+            self.load()
+        elif self.reload_interval > 0 and time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload_if_changed()
+        return self._current
+
+    @property
+    def model(self):
+        return self.current()[0]
+
+    @property
+    def version(self):
+        return self._current[1] if self._current is not None else None
+
+    @property
+    def artifact_path(self):
+        if self.model_format == "compact" or (self.model_format == "auto" and os.path.isdir(self.compact_path)):
+            return self.compact_path
+        return self.model_path
+
+    def _artifact_version(self):
+        path = self.artifact_path
+        # A compact export is complete once its meta.json exists, which is written last
+        stat = os.stat(os.path.join(path, META_FILE) if path == self.compact_path else path)
+        return f"{os.path.basename(path)}-{stat.st_mtime_ns}-{stat.st_size}"
+
+    def load(self):
+        """Load the artifact at model_path, once per process."""
+        with self._lock:
+            if self._current is None:
+                self._swap()
+        return self._current[0]
+
+    def reload_if_changed(self):
+        """
+        Swap in the artifact at model_path if it changed since the last load.
+
+        New artifacts should be written next to the old one and moved into place
+        with os.replace, so a half written file is never picked up.
+
+        Returns:
+            bool: True if a new model was swapped in.
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                if self._artifact_version() == self._artifact:
+                    return False
+            except FileNotFoundError:
+                # Keep serving the current model while the artifact is being replaced
+                return False
+            try:
+                self._swap()
+            except Exception as e:
+                # A partially written or broken artifact must not take serving down
+                logger.exception("Failed to reload fake review model, keeping version %s: %s", self.version, e)
+                return False
+            return True
+
+    def _swap(self):
+        artifact = self._artifact_version()
+        if self.artifact_path == self.compact_path:
+            new_model = CompactModel.load(self.compact_path)
+        else:
+            import joblib  # Only needed once a pickled model is loaded, keeps it out of import time
+            new_model = self._kernel(joblib.load(self.model_path, mmap_mode="r"))
+        # The version keys the prediction cache, and the two backends agree only within
+        # kernel_parity_tolerance, so their scores are cached apart
+        backend = "numpy" if isinstance(new_model, CompactModel) else "sklearn"
+        version = f"{artifact}-{backend}"
+        old, self._current = self._current, (new_model, version)
+        self._artifact = artifact
+        self._checked_at = time.monotonic()
+        if old is not None:
+            # Release the previous model now rather than at the next gc cycle
+            del old
+            gc.collect()
+        logger.info("Loaded fake review model %s (version %s)", self.artifact_path, version)
+
+    def _kernel(self, pipeline):
+        """Return the NumPy backend for pipeline if kernel_backend allows it, else pipeline itself."""
+        if self.kernel_backend == "sklearn":
+            return pipeline
+        try:
+            backend = CompactModel.from_pipeline(pipeline)
+        except ValueError as e:
+            logger.info("Scoring the %s model with sklearn, no NumPy backend: %s", self.name, e)
+            return pipeline
+        if self.kernel_backend == "numpy":
+            return backend
+
+        passed, difference = check_parity(pipeline, backend, tolerance=settings.kernel_parity_tolerance)
+        if not passed:
+            logger.warning("NumPy backend for the %s model differs from sklearn by %.2g, scoring with sklearn", self.name, difference)
+            return pipeline
+        logger.info("Scoring the %s model with the NumPy backend (max difference from sklearn %.2g)", self.name, difference)
+        return backend
+
+    def predict_proba(self, texts):
+        """
+        Score raw review strings with a single predict_proba pass.
+
+        Reviews found in the prediction cache skip preprocessing and scoring,
+        and repeated texts within the batch are scored once.
+
+        Args:
+            texts (list): Raw review strings.
+
+        Returns:
+            numpy.ndarray: Probability of each review being computer generated.
+        """
+        # Hold one reference so a concurrent swap can't change models mid batch
+        model, version = self.current()
+        REVIEWS_SCORED.inc(len(texts), model=self.name)
+        if not prediction_cache.enabled:
+            return self._score(model, texts)
+
+        keys = [PredictionCache.key(text, version) for text in texts]
+        cached = prediction_cache.get_many(keys)
+        # dict.fromkeys de-duplicates keys while keeping their order
+        missing = dict.fromkeys(key for key in keys if key not in cached)
+        if missing:
+            text_by_key = dict(zip(keys, texts))
+            missing_probabilities = self._score(model, [text_by_key[key] for key in missing])
+            scored = {key: float(probability) for key, probability in zip(missing, missing_probabilities)}
+            prediction_cache.set_many(scored)
+            cached.update(scored)
+
+        return np.array([cached[key] for key in keys])
+
+    @staticmethod
+    def _score(model, texts):
+        with STAGE_SECONDS.time(stage="preprocessing"):
+            documents = preprocess_batch(texts)
+        with STAGE_SECONDS.time(stage="vectorization"):
+            features = vectorize(model, documents)
+        with STAGE_SECONDS.time(stage="scoring"):
+            return classify(model, features)[:, 0]
+
+
+classifiers = {
+    "accurate": ReviewClassifier(settings.fake_review_model_path, name="accurate"),
+    "fast": ReviewClassifier(settings.fake_review_fast_model_path, name="fast"),
+    # Republished on every feedback update, and never exported compact
+    "online": ReviewClassifier(settings.fake_review_online_model_path, model_format="joblib", name="online"),
+}
+
+
+def get_classifier(model_tier=None):
+    """Return the classifier for model_tier, or the configured default tier."""
+    return classifiers[model_tier or settings.default_model_tier]
+
+
+def preload_models():
+    """
+    Load every tier's model once, at startup, so no request pays for it.
+
+    The tiers default requests need (see required_tiers) must load. Other tiers
+    whose artifacts are missing are skipped and loaded on first use instead.
+
+    Returns:
+        dict: Loaded model version per tier.
+    """
+    for tier, classifier in classifiers.items():
+        try:
+            classifier.load()
+        except FileNotFoundError:
+            if tier in required_tiers():
+                raise
+            logger.warning("No artifact for the %s model at %s, skipping preload", tier, classifier.artifact_path)
+    # Warm the stemmer too, its import is the other slow part of the first request
+    preprocess_batch(["warm up"])
+    return loaded_models()
+
+
+def loaded_models():
+    return {tier: classifier.version for tier, classifier in classifiers.items() if classifier.version is not None}
+
+
+def score_reviews(texts, model_tier=None):
+    """Module level entry point for the inference workers, picklable for process pools."""
+    return get_classifier(model_tier).predict_proba(texts)
+
+
+# One micro-batching worker per tier, so every batch is scored by a single model.
+# Started and stopped by the app lifespan.
+inference_workers = {tier: InferenceWorker(partial(score_reviews, model_tier=tier)) for tier in classifiers}
+
+
+def get_inference_worker(model_tier=None):
+    """Return the inference worker for model_tier, or the configured default tier."""
+    return inference_workers[model_tier or settings.default_model_tier]
+
+
+def required_tiers():
+    """Tiers that score requests for the default tier, both stages when it is cascaded."""
+    return {settings.default_model_tier, *(cascade_tiers() or ())}
+
+
+def cascade_tiers(model_tier=None):
+    """The (first, second) tiers that score model_tier requests, or None when they aren't cascaded."""
+    tier = model_tier or settings.default_model_tier
+    if tier == "accurate" and settings.cascade_band > 0 and settings.cascade_first_tier != tier:
+        return settings.cascade_first_tier, tier
+    return None
+
+
+def _escalate(probabilities, thresholds, first, second):
+    """Indices of the reviews the first tier is unsure about, and the stage of every review."""
+    escalated = np.flatnonzero(np.abs(probabilities - np.asarray(thresholds, dtype=float)) <= settings.cascade_band)
+    stages = np.full(len(probabilities), first, dtype=object)
+    stages[escalated] = second
+    CASCADE_DECISIONS.inc(len(probabilities) - len(escalated), stage=first)
+    CASCADE_DECISIONS.inc(len(escalated), stage=second)
+    return escalated, stages
+
+
+def score_stages(texts, thresholds, model_tier=None):
+    """
+    Score raw review strings, through the cascade when model_tier is cascaded (see cascade_tiers).
+
+    Args:
+        texts (list): Raw review strings.
+        thresholds (float or list): Threshold of every review, or one for all. The cascade
+            only escalates reviews whose first probability is near their threshold.
+        model_tier (str): Requested tier, defaults to settings.default_model_tier.
+
+    Returns:
+        tuple: (numpy.ndarray of fake probabilities, list of the tier that decided each review).
+    """
+    tier = model_tier or settings.default_model_tier
+    tiers = cascade_tiers(tier)
+    if tiers is None:
+        return get_classifier(tier).predict_proba(texts), [tier] * len(texts)
+
+    first, second = tiers
+    probabilities = np.array(get_classifier(first).predict_proba(texts), dtype=float)
+    escalated, stages = _escalate(probabilities, thresholds, first, second)
+    if len(escalated):
+        probabilities[escalated] = get_classifier(second).predict_proba([texts[i] for i in escalated])
+    return probabilities, stages.tolist()
+
+
+async def score_stages_async(texts, thresholds, model_tier=None):
+    """Same as score_stages, with both stages scored through their inference workers."""
+    tier = model_tier or settings.default_model_tier
+    tiers = cascade_tiers(tier)
+    if tiers is None:
+        return await get_inference_worker(tier).score(texts), [tier] * len(texts)
+
+    first, second = tiers
+    probabilities = np.array(await get_inference_worker(first).score(texts), dtype=float)
+    escalated, stages = _escalate(probabilities, thresholds, first, second)
+    if len(escalated):
+        probabilities[escalated] = await get_inference_worker(second).score([texts[i] for i in escalated])
+    return probabilities, stages.tolist()
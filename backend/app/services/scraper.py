@@ -1,19 +1,17 @@
 import asyncio
-import json
-import openai
-from crawl4ai import AsyncWebCrawler
-from crawl4ai.extraction_strategy import LLMExtractionStrategy
+import logging
+from contextlib import aclosing
 from pydantic import BaseModel, Field
-from dotenv import load_dotenv
 from pydantic import ValidationError
-import os
-
-# Load the .env file
-load_dotenv()
-
-# Access the API key
-openai.api_key = os.getenv('OPENAI_API_KEY')
+from ..config import settings
+from .cache import SQLiteCache, normalize_review_text
+from .browser_pool import crawler_pool
+from .page_pruner import prune_page
+from .structured_extractor import extract_structured_reviews
+from .llm_client import llm_client, LLMRateLimited
+from .metrics import STAGE_SECONDS, REVIEWS_SCRAPED, CACHE_LOOKUPS
 
+logger = logging.getLogger(__name__)
 
 # Not a model. Just return format definition. Dont move to models.py
 class Review(BaseModel):
@@ -22,65 +20,208 @@ class Review(BaseModel):
     rating: str = Field(..., description="Rating given in the review.")
 
 
-async def extract_reviews(base_url: str, page_limit:int = 1):
-    """Extracts reviews from the given URL using AsyncWebCrawler and returns them as a list of JSON objects."""
-    all_reviews = []
-    page_number = 1
+# Validated reviews per (url, page). Crawling and LLM extraction are by far the slowest
+# and most expensive stage, so repeat analyses of a page are served from here.
+scrape_cache = SQLiteCache(
+    settings.scrape_cache_path,
+    "scraped_reviews",
+    ttl=settings.scrape_cache_ttl,
+    max_entries=settings.scrape_cache_max_entries,
+    purge_every=50,
+) if settings.scrape_cache_path else None
+
+
+def scrape_cache_key(base_url: str, page_number: int):
+    return f"{base_url}#page={page_number}"
+
+
+def page_url(base_url: str, page_number: int):
+    return f"{base_url}-page-{page_number}" if page_number > 1 else base_url
+
+
+def validate_reviews(raw_reviews, url: str):
+    """Validates raw review dicts against the Review schema, dropping the ones that don't match."""
+    page_reviews = []
+    for review in raw_reviews:
+        try:
+            # Validate and match fields to Review schema
+            validated_review = Review(**review)
+            page_reviews.append(validated_review.model_dump())  # Convert to dict for FastAPI compatibility
+        except (ValidationError, TypeError) as ve:
+            logger.debug("Validation error for review from %s: %s", url, ve)
+    return page_reviews
 
+
+def merge_reviews(chunk_results):
+    """Flattens per-chunk LLM results in chunk order, keeping the first copy of each review."""
+    merged = []
+    seen = set()
+    for reviews in chunk_results:
+        for review in reviews or []:
+            if not isinstance(review, dict) or review.get("error"):
+                continue
+            key = (normalize_review_text(review.get("review_title", "")), normalize_review_text(review.get("review_text", "")))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(review)
+    return merged
+
+
+async def llm_extract_reviews(url: str, chunks: list):
+    """
+    Extracts reviews from pruned page chunks with the LLM.
+
+    Chunks are sent as separate, concurrent completions through the shared llm_client,
+    and reviews repeated across chunks are merged.
+
+    Raises:
+        LLMRateLimited: The LLM endpoint is rate limiting beyond the client's retries. This
+            is not an empty page, so it isn't reported as one.
+    """
+    async def extract_chunk(ix, chunk):
+        try:
+            return await llm_client.extract_reviews(url, chunk)
+        except LLMRateLimited:
+            raise
+        except Exception as e:
+            logger.warning("LLM extraction failed for chunk %d of %s: %s", ix, url, e)
+            return []
+
+    # A TaskGroup cancels the other chunks once one is rate limited, rather than letting
+    # them spend more of the rate budget on a page that is failing anyway
     try:
-        while True:
-                       
-            url = f"{base_url}-page-{page_number}" if page_number > 1 else base_url
-
-            async with AsyncWebCrawler(verbose=True) as crawler:
-                result = await crawler.arun(
-                    url=url,
-                    word_count_threshold=1,
-                    extraction_strategy=LLMExtractionStrategy(
-                        provider="openai/gpt-4o-mini",
-                        api_token=openai.api_key,
-                        schema=Review.model_json_schema(),
-                        extraction_type="schema",
-                        instruction="""From the crawled content, extract all reviews. The rating is supposed to be return as a fraction like 4/5 or 7/10 depending on the website.
-                            Each extracted review should be in JSON format as follows:
-                            {"review_title": "Title", "review_text": "Full review text", "rating": "Rating"}"""
-                    ),
-                    bypass_cache=True,
-                    magic = True,
-                    headless= False,
-                    
-                )
-
-                if not result.extracted_content:
-                    print(f"No content extracted from {url}.")
-                    break  # Stop if no more reviews are found
-                
-                # print("result.extracted_content",result.extracted_content)
-
-                # Parse JSON response
-                try:
-                    parsed_reviews = json.loads(result.extracted_content)
-                    # all_reviews.extend(parsed_reviews)
-                    for review in parsed_reviews:
-                        try:
-                            # Validate and match fields to Review schema
-                            validated_review = Review(**review)
-                            all_reviews.append(validated_review.dict())  # Convert to dict for FastAPI compatibility
-                        except ValidationError as ve:
-                            print(f"Validation error for review: {ve}")
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing JSON from {url}: {e}")
-                    break
-                
-                # print("parsed reviews: ",parsed_reviews)
-            
-            if page_number == page_limit:  # Limit to 1 page for testing/ default
-                break
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(extract_chunk(ix, chunk)) for ix, chunk in enumerate(chunks)]
+    except* LLMRateLimited as rate_limited:
+        raise rate_limited.exceptions[0] from None
+    return merge_reviews(task.result() for task in tasks)
+
+
+async def crawl_page(crawler, base_url: str, page_number: int):
+    """
+    Crawls one page with an open crawler and returns its validated reviews, empty if there are none.
+
+    Reviews published as JSON-LD, microdata or matching a per-domain CSS profile are read straight
+    from the HTML. Only pages where none of those find anything are sent to the LLM, and then only
+    their review region, see page_pruner.
+    """
+    url = page_url(base_url, page_number)
 
-            page_number += 1  # Move to the next page
+    with STAGE_SECONDS.time(stage="crawl"):
+        result = await crawler.arun(
+            url=url,
+            word_count_threshold=1,
+            bypass_cache=True,
+            magic = True,
+        )
 
+    with STAGE_SECONDS.time(stage="structured_extraction"):
+        method, raw_reviews = extract_structured_reviews(result.html, url)
+    with STAGE_SECONDS.time(stage="validation"):
+        page_reviews = validate_reviews(raw_reviews, url)
+    if page_reviews:
+        logger.debug("Extracted %d reviews from %s using %s", len(page_reviews), url, method)
+    else:
+        # Decided on what survives validation, structured data that doesn't fit Review
+        # is no reason to skip the LLM
+        method = "llm"
+        with STAGE_SECONDS.time(stage="pruning"):
+            chunks = await asyncio.to_thread(prune_page, result.html, settings.llm_chunk_token_budget)
+        if chunks:
+            logger.debug("Sending %d pruned chunk(s) of %s to the LLM", len(chunks), url)
+            with STAGE_SECONDS.time(stage="llm_extraction"):
+                raw_reviews = await llm_extract_reviews(url, chunks)
+            # LLM blocks that failed come back with an error flag instead of review fields
+            with STAGE_SECONDS.time(stage="validation"):
+                page_reviews = validate_reviews([review for review in raw_reviews if isinstance(review, dict) and not review.get("error")], url)
+
+    if not page_reviews:
+        logger.info("No content extracted from %s", url)
+        return []
+
+    REVIEWS_SCRAPED.inc(len(page_reviews), method=method)
+    return page_reviews
+
+
+async def iter_review_pages(base_url: str, page_limit:int = 1, force_refresh: bool = False):
+    """
+    Async generator of (page_number, reviews) for each page of the given URL, in page order.
+
+    Pages found in the scrape cache are yielded without crawling, unless force_refresh is set.
+    The remaining pages are crawled concurrently (up to settings.scrape_concurrency at a time)
+    with a single crawler leased from the warm pool, and each page is yielded as soon as it and the pages before it are
+    done. Pagination stops at the first page that comes back empty.
+    """
+    page_numbers = range(1, page_limit + 1)
+
+    cached_pages = {}
+    if scrape_cache is not None and not force_refresh:
+        cached = await asyncio.to_thread(scrape_cache.get_many, [scrape_cache_key(base_url, n) for n in page_numbers])
+        cached_pages = {n: cached[scrape_cache_key(base_url, n)] for n in page_numbers if scrape_cache_key(base_url, n) in cached}
+        CACHE_LOOKUPS.inc(len(cached_pages), cache="scrape", result="hit")
+        CACHE_LOOKUPS.inc(page_limit - len(cached_pages), cache="scrape", result="miss")
+
+    if len(cached_pages) == page_limit:
+        logger.debug("Using cached reviews for all %d page(s) of %s", page_limit, base_url)
+        for page_number in page_numbers:
+            yield page_number, cached_pages[page_number]
+        return
+
+    try:
+        async with crawler_pool.lease() as crawler:
+            semaphore = asyncio.Semaphore(settings.scrape_concurrency)
+            tasks = {}
+
+            async def fetch_page(page_number):
+                if page_number in cached_pages:
+                    return cached_pages[page_number]
+
+                async with semaphore:
+                    try:
+                        page_reviews = await crawl_page(crawler, base_url, page_number)
+                    except LLMRateLimited:
+                        raise
+                    except Exception as e:
+                        logger.warning("An error occurred while extracting reviews from page %d of %s: %s", page_number, base_url, e)
+                        page_reviews = []
+
+                if not page_reviews:
+                    # Past the last page, so don't crawl anything after it
+                    for later_page, task in tasks.items():
+                        if later_page > page_number:
+                            task.cancel()
+                elif scrape_cache is not None:
+                    # Empty pages aren't cached, they are as likely to be a failed extraction as the end of the reviews
+                    await asyncio.to_thread(scrape_cache.set, scrape_cache_key(base_url, page_number), page_reviews)
+                return page_reviews
+
+            tasks.update({n: asyncio.create_task(fetch_page(n)) for n in page_numbers})
+            try:
+                # Yield in page order, so reviews keep their on-site order
+                for page_number in page_numbers:
+                    page_reviews = await tasks[page_number]
+                    if not page_reviews:
+                        break  # Stop if no more reviews are found
+                    yield page_number, page_reviews
+            finally:
+                for task in tasks.values():
+                    task.cancel()
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    except LLMRateLimited:
+        raise
     except Exception as e:
-        print(f"An error occurred while extracting reviews: {e}")
+        logger.exception("An error occurred while extracting reviews from %s: %s", base_url, e)
+
+
+async def extract_reviews(base_url: str, page_limit:int = 1, force_refresh: bool = False):
+    """Extracts reviews from the given URL using AsyncWebCrawler and returns them as a list of JSON objects."""
+    all_reviews = []
+
+    async with aclosing(iter_review_pages(base_url, page_limit, force_refresh)) as pages:
+        async for _, page_reviews in pages:
+            all_reviews.extend(page_reviews)
 
     return all_reviews
 
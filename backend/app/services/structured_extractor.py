@@ -0,0 +1,194 @@
+import json
+import re
+from urllib.parse import urlparse
+
+# Fast path for review extraction: many review pages already embed their reviews as
+# schema.org data or in stable markup, which is parsed here in milliseconds instead of
+# sending the page through the LLM. Every extractor returns raw dicts with
+# review_title, review_text and rating; the scraper validates them with Review. Reviews
+# published without a rating get an empty one rather than being dropped.
+
+_JSON_LD_RE = re.compile(r'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+_FRACTION_RE = re.compile(r'(\d+(?:[.,]\d+)?)\s*(?:/|out of|of)\s*(\d+(?:[.,]\d+)?)', re.I)
+_NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)?')
+
+# Per-domain CSS selectors for sites that don't publish structured review data.
+# "review" selects one element per review. The other fields are looked up inside it,
+# trying each selector in order, so site redesigns can be covered side by side.
+# "best_rating" is used when the rating text has no "x/y" or "x out of y" form.
+CSS_PROFILES = {
+    "amazon": {
+        "review": '[data-hook="review"]',
+        "title": ('[data-hook="review-title"] > span:not(.a-icon-alt)', '[data-hook="review-title"]'),
+        "text": ('[data-hook="review-body"]',),
+        "rating": ('[data-hook="review-star-rating"]', '[data-hook="cmps-review-star-rating"]'),
+        "best_rating": 5,
+    },
+    "imdb": {
+        "review": '.review-container, article.user-review-item',
+        "title": ('.title', '[data-testid="review-summary"]'),
+        "text": ('.text.show-more__control', '[data-testid="review-overflow"]'),
+        "rating": ('.rating-other-user-rating', '.ipc-rating-star--rating'),
+        "best_rating": 10,
+    },
+    "trustpilot": {
+        "review": 'article[data-service-review-card-paper], [data-review-id]',
+        "title": ('[data-service-review-title-typography]',),
+        "text": ('[data-service-review-text-typography]',),
+        "rating": ('[data-service-review-rating]',),
+        "best_rating": 5,
+    },
+}
+
+
+def _format_number(value):
+    value = str(value).replace(",", ".")
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return str(int(number)) if number.is_integer() else str(number)
+
+
+def normalize_rating(value, best_rating=5):
+    """Turn "4", "4.0 out of 5 stars" or "8/10" into the "x/y" form the rest of the app expects."""
+    if value is None:
+        return None
+    text = str(value).strip()
+    match = _FRACTION_RE.search(text)
+    if match:
+        return f"{_format_number(match.group(1))}/{_format_number(match.group(2))}"
+    match = _NUMBER_RE.search(text)
+    if match:
+        return f"{_format_number(match.group(0))}/{_format_number(best_rating)}"
+    return None
+
+
+def _is_review(node):
+    types = node.get("@type")
+    types = types if isinstance(types, list) else [types]
+    return any(isinstance(t, str) and t.rsplit("/", 1)[-1] in ("Review", "UserReview", "CriticReview") for t in types)
+
+
+def _walk_json_ld(node):
+    """Yield every schema.org Review object, wherever it sits (Product.review, @graph, lists)."""
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk_json_ld(item)
+    elif isinstance(node, dict):
+        if _is_review(node):
+            yield node
+            return
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                yield from _walk_json_ld(value)
+
+
+def extract_json_ld(html):
+    reviews = []
+    for block in _JSON_LD_RE.findall(html):
+        try:
+            data = json.loads(block.strip())
+        except json.JSONDecodeError:
+            continue
+        for node in _walk_json_ld(data):
+            review_rating = node.get("reviewRating")
+            if isinstance(review_rating, dict):
+                rating = normalize_rating(review_rating.get("ratingValue"), review_rating.get("bestRating") or 5)
+            else:
+                rating = normalize_rating(review_rating)
+            reviews.append({
+                "review_title": node.get("name") or node.get("headline") or "",
+                "review_text": node.get("reviewBody") or node.get("description") or "",
+                "rating": rating or "",
+            })
+    return reviews
+
+
+def _itemprop(scope, name):
+    element = scope.find(attrs={"itemprop": name})
+    if element is None:
+        return None
+    return element.get("content") or element.get_text(" ", strip=True)
+
+
+def extract_microdata(soup):
+    reviews = []
+    for scope in soup.find_all(attrs={"itemtype": re.compile(r"schema\.org/(User|Critic)?Review$", re.I)}):
+        rating_scope = scope.find(attrs={"itemprop": "reviewRating"})
+        rating = None
+        if rating_scope is not None:
+            rating = normalize_rating(_itemprop(rating_scope, "ratingValue"), _itemprop(rating_scope, "bestRating") or 5)
+        reviews.append({
+            "review_title": _itemprop(scope, "name") or _itemprop(scope, "headline") or "",
+            "review_text": _itemprop(scope, "reviewBody") or _itemprop(scope, "description") or "",
+            "rating": rating or "",
+        })
+    return reviews
+
+
+def css_profile_for(url):
+    host = urlparse(url).hostname or ""
+    for name, profile in CSS_PROFILES.items():
+        if name in host.split("."):
+            return profile
+    return None
+
+
+def _select_first(element, selectors):
+    for selector in selectors:
+        found = element.select_one(selector)
+        if found is not None:
+            return found
+    return None
+
+
+def extract_with_css(soup, profile):
+    reviews = []
+    for element in soup.select(profile["review"]):
+        title = _select_first(element, profile["title"])
+        text = _select_first(element, profile["text"])
+        rating = _select_first(element, profile["rating"])
+        rating_text = None
+        if rating is not None:
+            rating_text = rating.get("data-service-review-rating") or rating.get_text(" ", strip=True)
+        reviews.append({
+            "review_title": title.get_text(" ", strip=True) if title else "",
+            "review_text": text.get_text(" ", strip=True) if text else "",
+            "rating": normalize_rating(rating_text, profile["best_rating"]) or "",
+        })
+    return reviews
+
+
+def extract_structured_reviews(html, url):
+    """
+    Try JSON-LD, then microdata, then the domain's CSS profile.
+
+    Args:
+        html (str): Raw page HTML.
+        url (str): Page URL, used to pick a CSS profile.
+
+    Returns:
+        tuple: (method, reviews) for the first extractor that found reviews with text,
+            or (None, []) when the page needs the LLM.
+    """
+    if not html:
+        return None, []
+
+    reviews = [review for review in extract_json_ld(html) if review["review_text"]]
+    if reviews:
+        return "json-ld", reviews
+
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
+    reviews = [review for review in extract_microdata(soup) if review["review_text"]]
+    if reviews:
+        return "microdata", reviews
+
+    profile = css_profile_for(url)
+    if profile is not None:
+        reviews = [review for review in extract_with_css(soup, profile) if review["review_text"]]
+        if reviews:
+            return "css", reviews
+
+    return None, []
@@ -145,31 +145,17 @@ reviews_list= [
         }
     ]
 
+import os
+import sys
 import joblib
-import string
-from nltk.corpus import stopwords
-from nltk import word_tokenize
 import math
 
+# Lets the script run directly as well as through python -m app.services.test_classifier
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from app.services.preprocessing import preprocess_batch
 
-# Ensure NLTK stopwords are downloaded
-stop_words = set(stopwords.words('english'))
-
-def text_process(review):
-    """
-    Preprocess the review text by removing punctuation and stop words.
-    
-    Args:
-        review (str): The review text to process.
-    
-    Returns:
-        list: A list of processed words.
-    """
-    # Remove punctuation
-    nopunc = [char for char in review if char not in string.punctuation]
-    nopunc = ''.join(nopunc)
-    # Return words that are not stop words
-    return [word for word in nopunc.split() if word.lower() not in stop_words]
+# Relative to this file, so the script works from any working directory
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'models', 'fake_review_model.joblib')
 
 def test_model(reviews_list,threshold = 0.70):
     
@@ -178,6 +164,8 @@ def test_model(reviews_list,threshold = 0.70):
     test_data = []
     for review_dict in reviews_list:
         test_data.append(review_dict["review_title"]+ " " + review_dict["review_text"])
+    # The model is trained on preprocessed text, see app/services/preprocessing.py
+    model_input = preprocess_batch(test_data)
 
     """
     Load the trained model and make predictions on the provided test data.
@@ -189,14 +177,14 @@ def test_model(reviews_list,threshold = 0.70):
         None: Prints predictions and their probabilities.
     """
     # Load the model from the pickle file
-    with open('../../models/fake_review_model.joblib', 'rb') as file:
+    with open(MODEL_PATH, 'rb') as file:
         loaded_model = joblib.load(file)
 
     # Make predictions
-    predictions = loaded_model.predict(test_data)
+    predictions = loaded_model.predict(model_input)
 
     # Get class labels and probabilities
-    probabilities = loaded_model.predict_proba(test_data)
+    probabilities = loaded_model.predict_proba(model_input)
     class_labels = loaded_model.classes_
 
     # Print predictions
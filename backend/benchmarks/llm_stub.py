@@ -0,0 +1,68 @@
+import asyncio
+import itertools
+import json
+import os
+import re
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# OpenAI compatible stand-in for LLM extraction, so the scraper can be exercised and benchmarked
+# without an API key or cost:
+#
+#   uvicorn benchmarks.llm_stub:app --port 8001
+#   LLM_BASE_URL=http://127.0.0.1:8001/v1 uvicorn app.main:app
+#
+# Every paragraph of the pruned page chunk (see page_pruner.chunk_blocks) becomes one review.
+# LLM_STUB_LATENCY_MS adds a fixed delay per call, and LLM_STUB_RATE_LIMIT_EVERY answers every
+# Nth call with a 429, to exercise the client's retries.
+
+LATENCY = float(os.getenv("LLM_STUB_LATENCY_MS", "50")) / 1000
+RATE_LIMIT_EVERY = int(os.getenv("LLM_STUB_RATE_LIMIT_EVERY", "0"))
+
+RATING_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(?:/|out of)\s*(5|10)\b")
+
+app = FastAPI()
+_calls = itertools.count(1)
+
+
+def extract(content):
+    reviews = []
+    for paragraph in content.split("\n\n"):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph or paragraph.startswith("URL:"):
+            continue
+        rating = RATING_PATTERN.search(paragraph)
+        reviews.append({
+            "review_title": " ".join(paragraph.split()[:6]),
+            "review_text": paragraph,
+            "rating": f"{rating.group(1)}/{rating.group(2)}" if rating else "5/5",
+        })
+    return reviews
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    call = next(_calls)
+    body = await request.json()
+    await asyncio.sleep(LATENCY)
+    if RATE_LIMIT_EVERY and call % RATE_LIMIT_EVERY == 0:
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+
+    prompt = "\n\n".join(message["content"] for message in body["messages"])
+    user_content = body["messages"][-1]["content"]
+    answer = json.dumps({"reviews": extract(user_content)})
+    prompt_tokens = int(len(prompt.split()) * 1.3)
+    completion_tokens = int(len(answer.split()) * 1.3)
+    return {
+        "id": f"chatcmpl-stub-{call}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+    }
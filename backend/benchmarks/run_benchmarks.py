@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+# Scores must be computed every time, not served from the prediction cache
+os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")
+os.environ.setdefault("PREDICTION_CACHE_PATH", "")
+
+BACKEND_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# Model and cache paths in the settings are relative to backend/, so move there before the app
+# modules below resolve anything. Paths on the command line stay relative to where we started.
+CALLER_DIR = os.getcwd()
+os.chdir(BACKEND_DIR)
+sys.path.append(BACKEND_DIR)
+
+from app.services.test_classifier import reviews_list
+from app.services.fake_review_classifier import preprocess_reviews, detect_fake_reviews
+from app.services.open_api_controller import api_check_fake_reviews
+from app.config import settings
+from app.services.review_classifier import get_classifier, score_stages
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINES_PATH = os.path.join(BENCHMARK_DIR, "baselines.json")
+DATASET_PATH = os.path.join(BACKEND_DIR, "training", "fake reviews dataset.csv")
+
+BATCH_SIZES = (1, 100, 1000)
+# Review lengths in words. "long" keeps the full multi-kilobyte IMDb reviews from the fixture.
+REVIEW_LENGTHS = {"short": 12, "medium": 60, "long": None}
+
+
+def make_reviews(count, length):
+    """Cycle through the fixture reviews, truncated to length words, until there are count of them."""
+    words = REVIEW_LENGTHS[length]
+    reviews = []
+    for i in range(count):
+        review = reviews_list[i % len(reviews_list)]
+        text = review["review_text"] if words is None else " ".join(review["review_text"].split()[:words])
+        reviews.append({"review_title": review["review_title"], "review_text": text, "rating": review["rating"]})
+    return reviews
+
+
+def measure(fn, items, min_time=0.5, min_rounds=3):
+    """
+    Call fn repeatedly (after one warm up call) for at least min_time seconds.
+
+    Returns:
+        dict: Throughput in items per second from the median round, and the
+            median and worst round times in milliseconds.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+        durations = []
+        started = time.perf_counter()
+        while len(durations) < min_rounds or time.perf_counter() - started < min_time:
+            start = time.perf_counter()
+            fn()
+            durations.append(time.perf_counter() - start)
+    median = statistics.median(durations)
+    return {
+        "throughput": items / median,
+        "p50_ms": median * 1000,
+        "max_ms": max(durations) * 1000,
+        "rounds": len(durations),
+    }
+
+
+def function_cases():
+    cases = []
+    for length in REVIEW_LENGTHS:
+        for batch_size in BATCH_SIZES:
+            reviews = make_reviews(batch_size, length)
+            api_reviews = [{"review_text": review["review_text"]} for review in reviews]
+            cases += [
+                (f"preprocess_reviews[{length}-{batch_size}]", lambda r=reviews: preprocess_reviews(r), batch_size),
+                (f"detect_fake_reviews[{length}-{batch_size}]", lambda r=reviews: detect_fake_reviews(r), batch_size),
+                (f"api_check_fake_reviews[{length}-{batch_size}]", lambda r=api_reviews: api_check_fake_reviews(r), batch_size),
+            ]
+    return cases
+
+
+def route_cases():
+    """
+    The three main routes end to end through an in-process TestClient.
+
+    The client is used without its lifespan, so no browsers are launched and
+    scoring takes the inline path. The scraper is replaced by a stub that returns
+    fixture reviews, so /analyze-reviews measures everything but the crawl.
+    """
+    from fastapi.testclient import TestClient
+    from app.api import routes
+    from app.main import app
+
+    scraped = make_reviews(100, "long")
+
+    async def stub_extract_reviews(base_url, page_limit=1, force_refresh=False):
+        await asyncio.sleep(0)
+        return scraped
+
+    routes.extract_reviews = stub_extract_reviews
+    client = TestClient(app)
+    medium_review = make_reviews(1, "medium")[0]["review_text"]
+
+    def post(path, payload):
+        response = client.post(path, json=payload)
+        response.raise_for_status()
+
+    return [
+        ("route:/api/analyze-reviews[100 long]", lambda: post("/api/analyze-reviews", {"url": "http://stub.local/product", "threshold": 0.7}), 1),
+        ("route:/api/analyze-single-review", lambda: post("/api/analyze-single-review", {"review": medium_review, "rating": "4/5"}), 1),
+        ("route:/api/openapi-verify-review", lambda: post("/api/openapi-verify-review", {"review": medium_review, "threshold": "medium"}), 1),
+    ]
+
+
+def cascade_cases(dataset, bands, sample, threshold=0.7, min_time=0.5):
+    """
+    The fast to accurate cascade against the accurate model alone, on labelled reviews from dataset.
+
+    For every band, reports the fraction of reviews escalated to the accurate model, the
+    throughput gain, how often the cascade agrees with the accurate model's label, and the
+    accuracy of both against the dataset labels.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(dataset, usecols=["text_", "label"]).dropna()
+    df = df.sample(min(sample, len(df)), random_state=0)
+    texts = df["text_"].astype(str).tolist()
+    is_fake = (df["label"] == "CG").to_numpy()
+    accurate = get_classifier("accurate")
+    get_classifier(settings.cascade_first_tier).load()
+
+    results = {}
+    accurate_fake = accurate.predict_proba(texts) >= threshold
+    name = f"cascade:accurate-only[{len(texts)}]"
+    results[name] = measure(lambda: accurate.predict_proba(texts), len(texts), min_time=min_time)
+    results[name]["accuracy"] = float((accurate_fake == is_fake).mean())
+    baseline = results[name]["throughput"]
+    print(f"{name:<45} {baseline:>12.1f}/s  accuracy {results[name]['accuracy']:.3f}")
+
+    configured_band = settings.cascade_band
+    try:
+        for band in bands:
+            settings.cascade_band = band
+            probabilities, stages = score_stages(texts, threshold, "accurate")
+            cascade_fake = probabilities >= threshold
+            name = f"cascade:band-{band}[{len(texts)}]"
+            results[name] = measure(lambda: score_stages(texts, threshold, "accurate"), len(texts), min_time=min_time)
+            results[name].update(
+                escalated=stages.count("accurate") / len(stages),
+                speedup=results[name]["throughput"] / baseline,
+                agreement=float((cascade_fake == accurate_fake).mean()),
+                accuracy=float((cascade_fake == is_fake).mean()),
+            )
+            result = results[name]
+            print(f"{name:<45} {result['throughput']:>12.1f}/s  escalated {result['escalated']:.1%}  "
+                  f"speedup {result['speedup']:.2f}x  agreement {result['agreement']:.3f}  accuracy {result['accuracy']:.3f}")
+    finally:
+        settings.cascade_band = configured_band
+    return results
+
+
+def compare(results, baselines, tolerance):
+    """Return the names of cases whose throughput fell more than tolerance below their baseline."""
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        floor = baseline["throughput"] * (1 - tolerance)
+        change = result["throughput"] / baseline["throughput"] - 1
+        status = "REGRESSION" if result["throughput"] < floor else "ok"
+        print(f"{status:>10}  {name:<45} {result['throughput']:>12.1f}/s  baseline {baseline['throughput']:>12.1f}/s  ({change:+.1%})")
+        if result["throughput"] < floor:
+            regressions.append(name)
+    return regressions
+
+
+def _caller_path(path):
+    return os.path.join(CALLER_DIR, path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark inference and the API, failing on throughput regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput drop below baseline, 0.2 is 20%%.")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds each case is run for.")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this.")
+    parser.add_argument("--update-baselines", action="store_true", help="Store this run's results as the new baselines.")
+    parser.add_argument("--output", type=_caller_path, default=None, help="Also write this run's results to a JSON file.")
+    parser.add_argument("--cascade-dataset", type=_caller_path, default=DATASET_PATH, help="Labelled reviews (text_, label) for the cascade cases, skipped if missing.")
+    parser.add_argument("--cascade-bands", type=float, nargs="+", default=[0.1, 0.2, 0.3], help="Uncertainty bands to compare.")
+    parser.add_argument("--cascade-sample", type=int, default=2000, help="Reviews from the dataset scored per cascade case.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.update_baselines and not os.path.exists(BASELINES_PATH):
+        # Passing without anything to compare against would hide every regression
+        print(f"No baselines at {BASELINES_PATH}, record them with --update-baselines", file=sys.stderr)
+        return 2
+
+    cases = [case for case in function_cases() + route_cases() if args.filter in case[0]]
+    classifier = get_classifier()
+    classifier.load()
+
+    results = {}
+    for name, fn, items in cases:
+        results[name] = measure(fn, items, min_time=args.min_time)
+        print(f"{name:<45} {results[name]['throughput']:>12.1f}/s  p50 {results[name]['p50_ms']:.2f} ms")
+
+    if "cascade" in args.filter or not args.filter:
+        if os.path.exists(args.cascade_dataset):
+            results.update(cascade_cases(args.cascade_dataset, args.cascade_bands, args.cascade_sample, min_time=args.min_time))
+        else:
+            print(f"Skipping the cascade cases, no dataset at {args.cascade_dataset}")
+
+    run = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "model_version": classifier.version,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+
+    if args.update_baselines:
+        # Baselines are only meaningful on the machine and model they were recorded with
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"Baselines written to {BASELINES_PATH}")
+        return 0
+
+    with open(BASELINES_PATH) as f:
+        stored = json.load(f)
+    if stored.get("model_version") != classifier.version:
+        print(f"Warning: baselines were recorded with model {stored.get('model_version')}, this run used {classifier.version}")
+
+    print()
+    regressions = compare(results, stored["results"], args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    print("No throughput regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
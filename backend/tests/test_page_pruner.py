@@ -0,0 +1,93 @@
+from pathlib import Path
+import pytest
+from app.services.page_pruner import chunk_blocks, estimate_tokens, find_review_blocks, prune_page
+from app.services.scraper import merge_reviews
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def load_fixture(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def test_review_blocks_kept_and_boilerplate_dropped():
+    blocks = find_review_blocks(load_fixture("plain_reviews.html"))
+    assert len(blocks) == 2
+    assert blocks[0].startswith("Lovely terrace") and blocks[0].endswith("4/5")
+    assert blocks[1].startswith("Booked for a birthday dinner") and blocks[1].endswith("5/5")
+    text = " ".join(blocks)
+    for boilerplate in ("Home", "Menu", "Contact", "Corner Bistro"):
+        assert boilerplate not in text
+
+
+def test_one_block_per_review_card():
+    blocks = find_review_blocks(load_fixture("trustpilot_reviews.html"))
+    assert blocks == [
+        "Delivered a day early Tracking was accurate and the driver left the parcel exactly where I asked.",
+        "Lost my package Marked as delivered, never arrived, and the refund took a month.",
+        "Fine Nothing special, nothing went wrong.",
+    ]
+
+
+def test_link_lists_lose_to_reviews():
+    related = "".join(
+        f'<li class="product"><a href="/p/{i}">Related product number {i} with a long descriptive link title</a></li>'
+        for i in range(6)
+    )
+    html = load_fixture("plain_reviews.html").replace("</body>", f'<ul class="related">{related}</ul></body>')
+    blocks = find_review_blocks(html)
+    assert len(blocks) == 2
+    assert not any("Related product" in block for block in blocks)
+
+
+def test_page_without_a_list_falls_back_to_its_text():
+    html = """<html><body><nav><a href="/">Home</a></nav>
+        <script>var tracking = true;</script>
+        <main><h1>Only review</h1><p>Works as described and arrived on time.</p></main>
+        <footer>Shop footer</footer></body></html>"""
+    assert find_review_blocks(html) == ["Only review\nWorks as described and arrived on time."]
+    assert find_review_blocks("") == []
+
+
+def test_chunks_keep_blocks_whole_and_in_order():
+    blocks = [" ".join(f"word{i}_{j}" for j in range(words)) for i, words in enumerate([40, 25, 60, 10, 30])]
+    chunks = chunk_blocks(blocks, token_budget=100)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+    # Every block lands whole in one chunk, and joining the chunks restores the page order
+    assert [block for chunk in chunks for block in chunk.split("\n\n")] == blocks
+
+
+def test_oversized_block_is_split_within_budget():
+    block = " ".join(f"w{i}" for i in range(500))
+    chunks = chunk_blocks(["short intro block here", block], token_budget=120)
+    assert all(estimate_tokens(chunk) <= 120 for chunk in chunks)
+    assert " ".join(" ".join(chunks).split()) == "short intro block here " + block
+
+
+@pytest.mark.parametrize("fixture", ["plain_reviews.html", "trustpilot_reviews.html", "microdata_reviews.html"])
+def test_prune_page_respects_budget(fixture):
+    html = load_fixture(fixture)
+    chunks = prune_page(html, token_budget=30)
+    assert all(estimate_tokens(chunk) <= 30 for chunk in chunks)
+    assert " ".join(" ".join(chunks).split()) == " ".join(" ".join(find_review_blocks(html)).split())
+    # One chunk when the budget allows it
+    assert len(prune_page(html, token_budget=1500)) == 1
+
+
+def test_overlapping_chunk_results_dedupe():
+    first = {"review_title": "Lost my package", "review_text": "Marked as delivered, never arrived.", "rating": "1/5"}
+    second = {"review_title": "Fine", "review_text": "Nothing special.", "rating": ""}
+    chunk_results = [
+        [first, second],
+        # The same reviews again from an overlapping chunk, differing only in case and whitespace
+        [{"review_title": "lost my  package", "review_text": "Marked as delivered,\nnever arrived.", "rating": "1/5"}],
+        None,
+        [{"error": True, "tags": ["error"], "content": "timeout"}, "not a review", second],
+        [{"review_title": "Delivered early", "review_text": "Arrived a day early.", "rating": "5/5"}],
+    ]
+    assert merge_reviews(chunk_results) == [
+        first,
+        second,
+        {"review_title": "Delivered early", "review_text": "Arrived a day early.", "rating": "5/5"},
+    ]
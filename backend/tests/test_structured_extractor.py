@@ -0,0 +1,100 @@
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+from app.services import scraper
+from app.services.structured_extractor import extract_structured_reviews, normalize_rating
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def load_fixture(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+@pytest.mark.parametrize("value, best_rating, expected", [
+    ("4", 5, "4/5"),
+    ("4.0 out of 5 stars", 5, "4/5"),
+    ("8/10", 5, "8/10"),
+    ("Rated 4,5 of 5", 5, "4.5/5"),
+    (7, 10, "7/10"),
+    ("no rating", 5, None),
+    (None, 5, None),
+])
+def test_normalize_rating(value, best_rating, expected):
+    assert normalize_rating(value, best_rating) == expected
+
+
+def test_json_ld():
+    method, reviews = extract_structured_reviews(load_fixture("json_ld_product.html"), "https://shop.example.com/aurora")
+    assert method == "json-ld"
+    assert reviews == [
+        {"review_title": "Great sound for the price", "review_text": "Bass is punchy and the case fits in a coin pocket. Battery lasts a full work day.", "rating": "4/5"},
+        {"review_title": "Stopped charging", "review_text": "The left bud stopped charging after two weeks and support never answered.", "rating": "2/10"},
+        {"review_title": "No stars given", "review_text": "Comfortable enough for long flights, I never rate products though.", "rating": ""},
+    ]
+
+
+def test_microdata():
+    method, reviews = extract_structured_reviews(load_fixture("microdata_reviews.html"), "https://books.example.com/long-harbour")
+    assert method == "microdata"
+    assert [(review["review_title"], review["rating"]) for review in reviews] == [
+        ("Slow start, great ending", "8/10"),
+        ("Not for me", "2/5"),
+        ("Book club pick", ""),
+    ]
+
+
+def test_css_profile():
+    html = load_fixture("trustpilot_reviews.html")
+    method, reviews = extract_structured_reviews(html, "https://www.trustpilot.com/review/parcelwise.example")
+    assert method == "css"
+    assert [(review["review_title"], review["rating"]) for review in reviews] == [
+        ("Delivered a day early", "5/5"),
+        ("Lost my package", "1/5"),
+        ("Fine", ""),
+    ]
+    # The profile is picked by domain, other sites with the same markup need the LLM
+    assert extract_structured_reviews(html, "https://parcelwise.example/reviews") == (None, [])
+
+
+def test_plain_page_needs_llm():
+    assert extract_structured_reviews(load_fixture("plain_reviews.html"), "https://bistro.example.com/guestbook") == (None, [])
+    assert extract_structured_reviews("", "https://bistro.example.com/guestbook") == (None, [])
+
+
+class FakeCrawler:
+    def __init__(self, html):
+        self.html = html
+
+    async def arun(self, url, **kwargs):
+        return SimpleNamespace(html=self.html)
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+
+    async def fake_llm_extract_reviews(url, chunks):
+        calls.append(url)
+        return [{"review_title": "From the LLM", "review_text": "Extracted from the pruned page.", "rating": "3/5"}]
+
+    monkeypatch.setattr(scraper, "llm_extract_reviews", fake_llm_extract_reviews)
+    return calls
+
+
+def test_crawl_page_keeps_unrated_structured_reviews(llm_calls):
+    reviews = asyncio.run(scraper.crawl_page(FakeCrawler(load_fixture("json_ld_product.html")), "https://shop.example.com/aurora", 1))
+    assert [review["rating"] for review in reviews] == ["4/5", "2/10", ""]
+    assert llm_calls == []
+
+
+def test_crawl_page_falls_back_to_llm_when_nothing_validates(llm_calls):
+    # Structured reviews that don't fit the Review schema count as none found
+    data = {"@context": "https://schema.org", "@type": "Review", "name": {"@value": "Nested title"}, "reviewBody": "Body text"}
+    html = f'<html><head><script type="application/ld+json">{json.dumps(data)}</script></head>' \
+           f'<body>{load_fixture("plain_reviews.html")}</body></html>'
+    reviews = asyncio.run(scraper.crawl_page(FakeCrawler(html), "https://bistro.example.com/guestbook", 1))
+    assert [review["review_title"] for review in reviews] == ["From the LLM"]
+    assert llm_calls == ["https://bistro.example.com/guestbook"]
@@ -1,136 +1,182 @@
-import nltk
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
 import numpy as np
 import pandas as pd
 import warnings
-import string
-import nltk
-from nltk.corpus import stopwords
-from nltk import word_tokenize
-from nltk.stem import PorterStemmer, WordNetLemmatizer
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
 from sklearn.metrics import accuracy_score
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
-from sklearn.svm import SVC
+from sklearn.svm import SVC, LinearSVC
+from sklearn.calibration import CalibratedClassifierCV
 
-nltk.download('stopwords')
-nltk.download('omw-1.4')
-nltk.download('wordnet')
-nltk.download('punkt')
-nltk.download('punkt_tab')
+# Share preprocessing with the serving code so the model scores the same text it was trained on
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from app.services.preprocessing import STOP_WORDS, preprocess_batch, text_process
+from app.services.compact_model import export_compact_model
+from app.services.online_model import build_online_pipeline, publish_snapshot
 
 # Set to ignore warnings
 warnings.filterwarnings('ignore')
 
-# Visualize rating distribution
-from nltk.corpus import stopwords
-
-# Clean text function
-df = pd.read_csv('fake reviews dataset.csv')
-df.dropna(inplace=True)
-# Preload stop words
-stop_words = set(stopwords.words('english'))
-
-def clean_text(review):
-    nopunc = [char for char in review if char not in string.punctuation]
-    nopunc = ''.join(nopunc)
-    return ' '.join([word for word in nopunc.split() if word.lower() not in stop_words])
-
-
-# Apply text cleaning
-df['text_'] = df['text_'].astype(str)
-df['text_'] = df['text_'].apply(clean_text)
-
-def preprocess(text):
-    # Tokenize the text
-    tokens = word_tokenize(text)
-    # Filter out stop words, digits, and punctuation
-    return ' '.join([word for word in tokens if word not in stop_words and not word.isdigit() and word not in string.punctuation])
-
-# Apply preprocessing in chunks
-chunk_size = 10000
-for i in range(0, df.shape[0], chunk_size):
-    df['text_'][i:i + chunk_size] = df['text_'][i:i + chunk_size].apply(preprocess)
-
-df['text_'] = df['text_'].str.lower()
-
-
-# Stemming and Lemmatization
-stemmer = PorterStemmer()
-lemmatizer = WordNetLemmatizer()
-
-def stem_words(text):
-    return ' '.join([stemmer.stem(word) for word in text.split()])
-
-def lemmatize_words(text):
-    return ' '.join([lemmatizer.lemmatize(word) for word in text.split()])
-
-df['text_'] = df['text_'].apply(stem_words)
-df['text_'] = df['text_'].apply(lemmatize_words)
-
-# Save preprocessed dataset
-df.to_csv('Preprocessed Fake Reviews Detection Dataset.csv', index=False)
-
-df = pd.read_csv('Preprocessed Fake Reviews Detection Dataset.csv')
-
-def text_process(review):
-    nopunc = [char for char in review if char not in string.punctuation]
-    nopunc = ''.join(nopunc)
-    return [word for word in nopunc.split() if word.lower() not in stopwords.words('english')]
-
-df = df.dropna(subset=['text_'])
-df['text_'] = df['text_'].fillna('')
-
-
-bow_transformer = CountVectorizer(analyzer=text_process)
-
-bow_transformer.fit(df['text_'])
-
-review4 = df['text_'][3]
-
-bow_msg4 = bow_transformer.transform([review4])
-
-bow_reviews = bow_transformer.transform(df['text_'])
-
-tfidf_transformer = TfidfTransformer().fit(bow_reviews)
-tfidf_rev4 = tfidf_transformer.transform(bow_msg4)
-
-tfidf_reviews = tfidf_transformer.transform(bow_reviews)
-review_train, review_test, label_train, label_test = train_test_split(df['text_'],df['label'],test_size=0.35)
-
-pipeline = Pipeline([
-    ('bow',CountVectorizer(analyzer=text_process)),
-    ('tfidf',TfidfTransformer()),
-    ('classifier',SVC(probability=True))
-])
-
-
-pipeline.fit(review_train,label_train)
-svc_pred = pipeline.predict(review_test)
-print('Model Prediction Accuracy:',str(np.round(accuracy_score(label_test,svc_pred)*100,2)) + '%')
-
-
-from joblib import dump, load
-
-# Save the model using joblib
-dump(pipeline, '../models/fake_review_model.joblib')
-
-print("Model saved to backend/models/fake_review_model.joblib")
-
-# Load the model using joblib
-loaded_model = load('../models/fake_review_model.joblib')
-
-# Test the loaded model with some data
-test_data = ['very bad product.', 'bad', 'very bad noob']  # Replace with your actual test data
-predictions = loaded_model.predict(test_data)
-
-# Get the class labels and probabilities
-probabilities = loaded_model.predict_proba(test_data)
-class_labels = loaded_model.classes_
-
-# Print the predictions
-print("Predictions:", predictions)
-
-# Print the probabilities
-for label, prob in zip(class_labels, probabilities[0]):
-    print(f'Probability for {label}: {prob * 100:.2f}%')
\ No newline at end of file
+TRAINING_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Bump when preprocess_batch changes its output, so cached corpora are rebuilt
+PREPROCESSING_VERSION = 1
+
+
+def preprocessing_config(dataset_path, text_column='text_'):
+    """Everything that determines the preprocessed corpus. Its hash keys the corpus cache."""
+    with open(dataset_path, 'rb') as f:
+        dataset_hash = hashlib.file_digest(f, 'sha256').hexdigest()
+    return {
+        'preprocessing_version': PREPROCESSING_VERSION,
+        'stop_words': hashlib.sha256(' '.join(sorted(STOP_WORDS)).encode()).hexdigest(),
+        'text_column': text_column,
+        'dataset': dataset_hash,
+    }
+
+
+def preprocess_corpus(texts, workers=None, chunk_size=10000):
+    """
+    Preprocess texts in one fused pass (lowercase, punctuation, stopwords, digits, stemming)
+    spread over a process pool, one chunk per task.
+    """
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    if workers == 1 or len(chunks) == 1:
+        return [review for chunk in chunks for review in preprocess_batch(chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [review for processed in executor.map(preprocess_batch, chunks) for review in processed]
+
+
+def load_corpus(dataset_path, cache_dir, workers=None, chunk_size=10000, refresh=False):
+    """
+    Return the preprocessed dataset as a DataFrame with text_ and label columns.
+
+    The result is cached as Parquet under cache_dir, keyed by the hash of
+    preprocessing_config, so retraining only preprocesses again when the dataset
+    or the preprocessing changes.
+    """
+    config = preprocessing_config(dataset_path)
+    key = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, f'preprocessed-{key}.parquet')
+
+    if not refresh and os.path.exists(cache_path):
+        print(f'Using cached preprocessed corpus {cache_path}')
+        return pd.read_parquet(cache_path)
+
+    start = time.perf_counter()
+    df = pd.read_csv(dataset_path, usecols=['text_', 'label']).dropna()
+    df['text_'] = preprocess_corpus(df['text_'].astype(str).tolist(), workers=workers, chunk_size=chunk_size)
+    print(f'Preprocessed {len(df)} reviews in {time.perf_counter() - start:.1f}s')
+
+    os.makedirs(cache_dir, exist_ok=True)
+    df.to_parquet(cache_path + '.tmp', index=False)
+    os.replace(cache_path + '.tmp', cache_path)
+    with open(os.path.join(cache_dir, f'preprocessed-{key}.json'), 'w') as f:
+        json.dump(config, f, indent=2)
+    return df
+
+
+def build_pipelines():
+    return {
+        'accurate': Pipeline([
+            ('bow',CountVectorizer(analyzer=text_process)),
+            ('tfidf',TfidfTransformer()),
+            ('classifier',SVC(probability=True))
+        ]),
+        # Fast tier: a linear SVM on the same TF-IDF features. Scoring is one dot product per
+        # review regardless of training set size. Platt scaling through CalibratedClassifierCV
+        # gives it predict_proba, and ensemble=False keeps a single linear model at serve time.
+        'fast': Pipeline([
+            ('bow',CountVectorizer(analyzer=text_process)),
+            ('tfidf',TfidfTransformer()),
+            ('classifier',CalibratedClassifierCV(LinearSVC(), method='sigmoid', cv=5, ensemble=False))
+        ]),
+        # Online tier: hashed features and SGD, the starting point that /api/feedback and
+        # online_update.py keep updating with partial_fit
+        'online': build_online_pipeline(),
+    }
+
+
+MODEL_FILES = {
+    'accurate': 'fake_review_model',
+    'fast': 'fake_review_model_fast',
+    'online': 'fake_review_model_online',
+}
+
+
+def save_model(pipeline, models_dir, name, compact=True):
+    from joblib import dump
+
+    # Write next to the served artifact and move it into place, so a running
+    # server hot swapping the model never reads a partial file
+    path = os.path.join(models_dir, f'{name}.joblib')
+    os.makedirs(models_dir, exist_ok=True)
+    dump(pipeline, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    print(f'Model saved to {path}')
+
+    if compact:
+        # Compact, memory mapped export that the server prefers over the pickle (MODEL_FORMAT=auto)
+        export_compact_model(pipeline, os.path.join(models_dir, f'{name}.compact'))
+        print(f'Compact model saved to {os.path.join(models_dir, name)}.compact')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Train the fake review models.')
+    parser.add_argument('--dataset', default=os.path.join(TRAINING_DIR, 'fake reviews dataset.csv'), help='CSV with text_ and label columns.')
+    parser.add_argument('--models-dir', default=os.path.join(TRAINING_DIR, '..', 'models'), help='Where the trained artifacts are written.')
+    parser.add_argument('--cache-dir', default=os.path.join(TRAINING_DIR, 'cache'), help='Where preprocessed corpora are cached.')
+    parser.add_argument('--tiers', nargs='+', choices=sorted(MODEL_FILES), default=sorted(MODEL_FILES), help='Models to train.')
+    parser.add_argument('--workers', type=int, default=None, help='Preprocessing processes, defaults to the CPU count.')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Reviews per preprocessing task.')
+    parser.add_argument('--test-size', type=float, default=0.35)
+    parser.add_argument('--random-state', type=int, default=None, help='Seed for the train/test split.')
+    parser.add_argument('--refresh-cache', action='store_true', help='Preprocess again even if a cached corpus exists.')
+    parser.add_argument('--no-compact', action='store_true', help='Only write the joblib artifacts.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    df = load_corpus(args.dataset, args.cache_dir, workers=args.workers, chunk_size=args.chunk_size, refresh=args.refresh_cache)
+    df = df[df['text_'] != '']
+    review_train, review_test, label_train, label_test = train_test_split(
+        df['text_'], df['label'], test_size=args.test_size, random_state=args.random_state
+    )
+
+    pipelines = build_pipelines()
+    for tier in args.tiers:
+        pipeline = pipelines[tier]
+
+        start = time.perf_counter()
+        pipeline.fit(review_train,label_train)
+        fit_time = time.perf_counter() - start
+
+        pred = pipeline.predict(review_test)
+        print(f'{tier} model prediction accuracy: {np.round(accuracy_score(label_test,pred)*100,2)}% (fit in {fit_time:.1f}s)')
+
+        if tier == 'online':
+            # A fresh snapshot, so later feedback updates build on it and it can be rolled back to
+            version = publish_snapshot(pipeline, os.path.join(args.models_dir, f"{MODEL_FILES[tier]}.joblib"))
+            print(f'Online model published as snapshot v{version}')
+        else:
+            save_model(pipeline, args.models_dir, MODEL_FILES[tier], compact=not args.no_compact)
+
+        # Test the model with some data
+        test_data = preprocess_batch(['very bad product.', 'bad', 'very bad noob'])
+        probabilities = pipeline.predict_proba(test_data)
+        print("Predictions:", pipeline.predict(test_data))
+        for label, prob in zip(pipeline.classes_, probabilities[0]):
+            print(f'Probability for {label}: {prob * 100:.2f}%')
+
+
+if __name__ == '__main__':
+    main()
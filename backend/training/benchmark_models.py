@@ -0,0 +1,204 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.svm import SVC, LinearSVC
+
+# Also puts backend/ on sys.path for the app imports below
+from analyzer_training import TRAINING_DIR, load_corpus
+from app.services.preprocessing import text_process
+from app.services.compact_model import export_compact_model
+
+# Set to ignore warnings
+warnings.filterwarnings('ignore')
+
+# Model selection benchmark: every classifier is crossed with every vectorizer setting,
+# cross validated in parallel, then fitted once more alone to measure latency, size and memory.
+
+CLASSIFIERS = {
+    'svc_rbf': lambda: SVC(probability=True),
+    'linear_svc_calibrated': lambda: CalibratedClassifierCV(LinearSVC(), method='sigmoid', cv=5, ensemble=False),
+    'logistic_regression': lambda: LogisticRegression(max_iter=1000),
+    'sgd_log_loss': lambda: SGDClassifier(loss='log_loss', alpha=1e-5, max_iter=50, tol=None, random_state=0),
+    'sgd_modified_huber': lambda: SGDClassifier(loss='modified_huber', alpha=1e-5, max_iter=50, tol=None, random_state=0),
+}
+
+# (CountVectorizer kwargs, TfidfTransformer kwargs)
+VECTORIZERS = {
+    'default': ({}, {}),
+    'min_df2': ({'min_df': 2}, {}),
+    'min_df2_sublinear': ({'min_df': 2}, {'sublinear_tf': True}),
+    'top20k_binary': ({'max_features': 20000, 'binary': True}, {}),
+}
+
+BATCH_SIZES = (1, 100, 10000)
+# Timed repeats per batch size, fewer for the large batches
+REPEATS = {1: 200, 100: 50, 10000: 5}
+
+
+def build_pipeline(classifier, vectorizer):
+    bow_kwargs, tfidf_kwargs = VECTORIZERS[vectorizer]
+    return Pipeline([
+        ('bow',CountVectorizer(analyzer=text_process, **bow_kwargs)),
+        ('tfidf',TfidfTransformer(**tfidf_kwargs)),
+        ('classifier',CLASSIFIERS[classifier]())
+    ])
+
+
+def score_fold(classifier, vectorizer, texts, labels, train_index, test_index):
+    pipeline = build_pipeline(classifier, vectorizer)
+    pipeline.fit(texts[train_index], labels[train_index])
+    pred = pipeline.predict(texts[test_index])
+    return {
+        'classifier': classifier,
+        'vectorizer': vectorizer,
+        'accuracy': accuracy_score(labels[test_index], pred),
+        'f1': f1_score(labels[test_index], pred, average='macro'),
+    }
+
+
+def cross_validate_candidates(candidates, texts, labels, folds, jobs):
+    """Cross validate every (classifier, vectorizer) candidate, all folds of all candidates in parallel."""
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=0).split(texts, labels))
+    fold_scores = Parallel(n_jobs=jobs)(
+        delayed(score_fold)(classifier, vectorizer, texts, labels, train_index, test_index)
+        for classifier, vectorizer in candidates
+        for train_index, test_index in splits
+    )
+    scores = pd.DataFrame(fold_scores).groupby(['classifier', 'vectorizer'])
+    return scores.agg(
+        accuracy=('accuracy', 'mean'), accuracy_std=('accuracy', 'std'),
+        f1=('f1', 'mean'), f1_std=('f1', 'std'),
+    ).reset_index()
+
+
+def _directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def profile_candidate(classifier, vectorizer, train_texts, train_labels, sample_texts):
+    """
+    Fit one candidate and measure it as it would be served. Runs in a freshly spawned
+    process, so ru_maxrss is this candidate's own peak. A forked child would start from
+    the parent's high-water mark, corpus and cross validation included.
+    """
+    from joblib import dump, load
+
+    pipeline = build_pipeline(classifier, vectorizer)
+    start = time.perf_counter()
+    pipeline.fit(train_texts, train_labels)
+    fit_seconds = time.perf_counter() - start
+
+    workdir = tempfile.mkdtemp(prefix='benchmark-')
+    try:
+        artifact = os.path.join(workdir, 'model.joblib')
+        dump(pipeline, artifact)
+        row = {'fit_seconds': fit_seconds, 'artifact_mb': os.path.getsize(artifact) / 1e6, 'compact_artifact_mb': None}
+        try:
+            export_compact_model(pipeline, os.path.join(workdir, 'model.compact'))
+            row['compact_artifact_mb'] = _directory_size(os.path.join(workdir, 'model.compact')) / 1e6
+        except ValueError:
+            pass  # Not a classifier the compact format supports
+
+        start = time.perf_counter()
+        model = load(artifact)
+        row['load_seconds'] = time.perf_counter() - start
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    rng = np.random.default_rng(0)
+    for batch_size in BATCH_SIZES:
+        per_review = []
+        for _ in range(REPEATS[batch_size]):
+            batch = list(rng.choice(sample_texts, size=batch_size))
+            start = time.perf_counter()
+            model.predict_proba(batch)
+            per_review.append((time.perf_counter() - start) / batch_size)
+        row[f'p50_ms_batch_{batch_size}'] = np.percentile(per_review, 50) * 1000
+        row[f'p99_ms_batch_{batch_size}'] = np.percentile(per_review, 99) * 1000
+
+    tracemalloc.start()
+    model.predict_proba(list(rng.choice(sample_texts, size=BATCH_SIZES[-1])))
+    row['score_peak_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+
+    # ru_maxrss is in kilobytes on Linux
+    row['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+    return {'classifier': classifier, 'vectorizer': vectorizer, **row}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Compare candidate fake review models on accuracy, latency, size and memory.')
+    parser.add_argument('--dataset', default=os.path.join(TRAINING_DIR, 'fake reviews dataset.csv'))
+    parser.add_argument('--cache-dir', default=os.path.join(TRAINING_DIR, 'cache'))
+    parser.add_argument('--output-dir', default=os.path.join(TRAINING_DIR, 'benchmark_results'))
+    parser.add_argument('--classifiers', nargs='+', choices=sorted(CLASSIFIERS), default=sorted(CLASSIFIERS))
+    parser.add_argument('--vectorizers', nargs='+', choices=sorted(VECTORIZERS), default=sorted(VECTORIZERS))
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=-1, help='Parallel cross validation fits, -1 for every core.')
+    parser.add_argument('--sample', type=int, default=None, help='Benchmark on a stratified sample of this many reviews.')
+    parser.add_argument('--test-size', type=float, default=0.35, help='Held out share used as latency input.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    df = load_corpus(args.dataset, args.cache_dir)
+    df = df[df['text_'] != '']
+    if args.sample and args.sample < len(df):
+        df, _ = train_test_split(df, train_size=args.sample, stratify=df['label'], random_state=0)
+    texts = df['text_'].to_numpy(dtype=object)
+    labels = df['label'].to_numpy()
+
+    candidates = [(classifier, vectorizer) for classifier in args.classifiers for vectorizer in args.vectorizers]
+    print(f'Cross validating {len(candidates)} candidates on {len(df)} reviews ({args.folds} folds)')
+    start = time.perf_counter()
+    results = cross_validate_candidates(candidates, texts, labels, args.folds, args.jobs)
+    print(f'Cross validation done in {time.perf_counter() - start:.1f}s')
+
+    train_texts, test_texts, train_labels, _ = train_test_split(texts, labels, test_size=args.test_size, stratify=labels, random_state=0)
+    profiles = []
+    for classifier, vectorizer in candidates:
+        # One candidate at a time, each in its own process, so timings and peak memory don't interfere
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            profile = executor.submit(profile_candidate, classifier, vectorizer, train_texts, train_labels, test_texts).result()
+        print(f"{classifier} / {vectorizer}: p50 {profile['p50_ms_batch_1']:.3f} ms/review at batch 1, {profile['artifact_mb']:.3f} MB")
+        profiles.append(profile)
+
+    results = results.merge(pd.DataFrame(profiles), on=['classifier', 'vectorizer']).sort_values('f1', ascending=False)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    csv_path = os.path.join(args.output_dir, 'model_benchmark.csv')
+    json_path = os.path.join(args.output_dir, 'model_benchmark.json')
+    results.to_csv(csv_path, index=False)
+    with open(json_path, 'w') as f:
+        json.dump({
+            'reviews': len(df),
+            'folds': args.folds,
+            'batch_sizes': list(BATCH_SIZES),
+            'results': json.loads(results.to_json(orient='records')),
+        }, f, indent=2)
+
+    print(results[['classifier', 'vectorizer', 'accuracy', 'f1', 'p50_ms_batch_1', 'p99_ms_batch_100', 'artifact_mb', 'peak_rss_mb']].to_string(index=False))
+    print(f'Results written to {csv_path} and {json_path}')
+
+
+if __name__ == '__main__':
+    main()
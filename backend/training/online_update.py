@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import time
+import pandas as pd
+
+# Shares the serving code's online model, so updates land exactly where the server looks for them
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from app.config import settings
+from app.services.online_model import CLASSES, OnlineLearner, activate_snapshot, snapshot_versions
+
+
+def read_feedback(path, text_column, label_column):
+    """Labelled reviews from a CSV or JSON lines file, as (texts, labels)."""
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        df = pd.read_json(path, lines=path.endswith('.jsonl'))
+    else:
+        df = pd.read_csv(path)
+    df = df[[text_column, label_column]].dropna()
+    unknown = set(df[label_column]) - set(CLASSES)
+    if unknown:
+        raise SystemExit(f'Unknown labels {sorted(unknown)}, expected {list(CLASSES)}')
+    return df[text_column].astype(str).tolist(), df[label_column].tolist()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Update the online fake review model from labelled reviews, or roll it back.')
+    parser.add_argument('feedback', nargs='?', help='CSV or JSON lines file of labelled reviews.')
+    parser.add_argument('--model-path', default=settings.fake_review_online_model_path, help='Served online model, relative to backend/.')
+    parser.add_argument('--text-column', default='text_')
+    parser.add_argument('--label-column', default='label', help='CG (computer generated) or OR (original).')
+    parser.add_argument('--batch-size', type=int, default=None, help='Reviews per partial_fit call, defaults to ONLINE_BATCH_SIZE.')
+    parser.add_argument('--rollback', type=int, metavar='VERSION', help='Serve an earlier snapshot instead of updating.')
+    parser.add_argument('--list', action='store_true', help='List the published snapshots.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.batch_size:
+        settings.online_batch_size = args.batch_size
+
+    if args.list:
+        print('\n'.join(f'v{version}' for version in snapshot_versions(args.model_path)) or 'No snapshots')
+        return
+    if args.rollback is not None:
+        if args.rollback not in snapshot_versions(args.model_path):
+            raise SystemExit(f'No snapshot v{args.rollback} for {args.model_path}')
+        activate_snapshot(args.model_path, args.rollback)
+        print(f'Serving snapshot v{args.rollback} from {args.model_path}')
+        return
+    if not args.feedback:
+        raise SystemExit('Pass a feedback file, --rollback or --list')
+
+    texts, labels = read_feedback(args.feedback, args.text_column, args.label_column)
+    start = time.perf_counter()
+    result = OnlineLearner(args.model_path).update(texts, labels)
+    print(f"Applied {result['applied']} reviews in {time.perf_counter() - start:.1f}s, serving snapshot v{result['version']} from {args.model_path}")
+
+
+if __name__ == '__main__':
+    main()
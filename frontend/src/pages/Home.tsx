@@ -38,21 +38,28 @@ const THRESHOLD_VALUES: ThresholdValues = {
   strict: 0.90,
 }
 
+// Pages crawled per analysis, the backend accepts up to its max_page_limit setting (20 by default)
+const DEFAULT_PAGE_LIMIT = 3
+const MAX_PAGE_LIMIT = 20
+
 const validateAndFormatRating = (value: string): string | null => {
   const numValue = parseInt(value)
   if (isNaN(numValue) || numValue <= 0 || numValue > 5) return null
   return `${numValue}/5`
 }
 
-type ApiResponse = {
-  analyzed_reviews: {
-    review_text: string
-    confidence: number
-    label: boolean
-    rating: string
-  }[]
+type StreamTotals = {
+  reviews: number
+  real: number
+  fake: number
 }
 
+// One line of the NDJSON stream from /api/analyze-reviews/stream
+type StreamEvent =
+  | { type: 'page'; page: number; analyzed_reviews: Review[]; totals: StreamTotals }
+  | { type: 'done'; totals: StreamTotals }
+  | { type: 'error'; detail: string }
+
 export default function HomePage() {
   const { toast } = useToast()
   const [selectedMode, setSelectedMode] = useState<'automatic' | 'manual' | null>('automatic')
@@ -60,6 +67,7 @@ export default function HomePage() {
   const [analyzedData, setAnalyzedData] = useState<Review[] | null>(null)
   const [isLoading, setIsLoading] = useState(false)
   const [threshold, setThreshold] = useState<ThresholdOption | undefined>()
+  const [pageLimit, setPageLimit] = useState(String(DEFAULT_PAGE_LIMIT))
   const [manualRating, setManualRating] = useState('')
   const [ratingError, setRatingError] = useState<string | null>(null)
   const [manualReviews, setManualReviews] = useState<Review[]>([]);
@@ -80,23 +88,29 @@ export default function HomePage() {
 
     try {
       const thresholdValue = THRESHOLD_VALUES[threshold];
+      const parsedPageLimit = parseInt(pageLimit);
+      const pageLimitValue = isNaN(parsedPageLimit)
+        ? DEFAULT_PAGE_LIMIT
+        : Math.min(Math.max(parsedPageLimit, 1), MAX_PAGE_LIMIT);
       console.log('Sending request with:', {
         url,
-        threshold: thresholdValue
+        threshold: thresholdValue,
+        page_limit: pageLimitValue
       });
       
-      const response = await fetch('http://localhost:8000/api/analyze-reviews', {
+      const response = await fetch('http://localhost:8000/api/analyze-reviews/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
           url: url,
-          threshold: thresholdValue
+          threshold: thresholdValue,
+          page_limit: pageLimitValue
         })
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         const errorData = await response.json().catch(() => null);
         console.error('Server response:', {
           status: response.status,
@@ -109,17 +123,47 @@ export default function HomePage() {
         );
       }
 
-      const data: ApiResponse = await response.json();
-      console.log('Received response:', data);
-      
-      const transformedData: Review[] = data.analyzed_reviews.map(review => ({
-        review_text: review.review_text,
-        confidence: review.confidence,
-        label: review.label,
-        rating: review.rating
-      }));
+      // Each page of classified reviews arrives as its own JSON line, so the
+      // charts and review list update while later pages are still being crawled
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      const handleEvent = (event: StreamEvent) => {
+        if (event.type === 'error') {
+          throw new Error(event.detail);
+        }
+        if (event.type === 'page') {
+          console.log(`Received page ${event.page}:`, event.totals);
+          const pageReviews: Review[] = event.analyzed_reviews.map(review => ({
+            review_text: review.review_text,
+            confidence: review.confidence,
+            label: review.label,
+            rating: review.rating
+          }));
+          setAnalyzedData(prevData => [...(prevData ?? []), ...pageReviews]);
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        buffer += decoder.decode(value, { stream: !done });
 
-      setAnalyzedData(transformedData);
+        const lines = buffer.split('\n');
+        buffer = lines.pop() ?? '';
+        for (const line of lines) {
+          if (line.trim()) {
+            handleEvent(JSON.parse(line) as StreamEvent);
+          }
+        }
+
+        if (done) {
+          if (buffer.trim()) {
+            handleEvent(JSON.parse(buffer) as StreamEvent);
+          }
+          break;
+        }
+      }
 
       // Add this after successful analysis
       toast({
@@ -138,7 +182,7 @@ export default function HomePage() {
     } finally {
       setIsLoading(false);
     }
-  }, [url, threshold]);
+  }, [url, threshold, pageLimit]);
 
   const handleManualSubmit = async (e: React.FormEvent<HTMLFormElement>) => {
     e.preventDefault();
@@ -284,6 +328,16 @@ export default function HomePage() {
                       </SelectGroup>
                     </SelectContent>
                   </Select>
+                  <Input
+                    type="number"
+                    placeholder="Pages"
+                    title="Number of review pages to analyze"
+                    value={pageLimit}
+                    onChange={(e) => setPageLimit(e.target.value)}
+                    className="w-[100px]"
+                    min="1"
+                    max={MAX_PAGE_LIMIT}
+                  />
                 </div>
                 <Button 
                   onClick={handleUrlSubmit}
@@ -374,7 +428,12 @@ export default function HomePage() {
             )}
 
             <div className="mt-12 grid grid-cols-1 lg:grid-cols-2 gap-12 max-w-6xl mx-auto">
-              {isLoading ? (
+              {analyzedData && analyzedData.length > 0 ? (
+                <>
+                  <RatingPieChart data={analyzedData} />
+                  <ConfidenceHistogram data={analyzedData} />
+                </>
+              ) : isLoading ? (
                 <>
                   <Card>
                     <CardHeader>
@@ -395,15 +454,17 @@ export default function HomePage() {
                     </CardContent>
                   </Card>
                 </>
-              ) : analyzedData ? (
-                <>
-                  <RatingPieChart data={analyzedData} />
-                  <ConfidenceHistogram data={analyzedData} />
-                </>
               ) : null}
             </div>
 
-            {isLoading ? (
+            {analyzedData && analyzedData.length > 0 ? (
+              <div className="mt-12 space-y-8">
+                <h2 className="text-2xl font-bold text-center mb-6">Analyzed Reviews</h2>
+                {analyzedData.map((review, index) => (
+                  <ReviewCard key={index} review={review} index={index + 1} />
+                ))}
+              </div>
+            ) : isLoading ? (
               <div className="mt-12 space-y-8">
                 <h2 className="text-2xl font-bold text-center mb-6">Analyzed Reviews</h2>
                 {[1, 2, 3, 4].map((index) => (
@@ -427,13 +488,6 @@ export default function HomePage() {
                   </Card>
                 ))}
               </div>
-            ) : analyzedData ? (
-              <div className="mt-12 space-y-8">
-                <h2 className="text-2xl font-bold text-center mb-6">Analyzed Reviews</h2>
-                {analyzedData.map((review, index) => (
-                  <ReviewCard key={index} review={review} index={index + 1} />
-                ))}
-              </div>
             ) : null}
           </div>
         </div>